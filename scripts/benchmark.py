@@ -0,0 +1,254 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from src import kernels, utils
+from src import utils_fft
+from src.simulation import simulate_rf_gradient
+
+SIZES = {
+    "quick": {"n": [1000], "shapes": [(128, 128)], "spins": [1000], "steps": [200]},
+    "default": {
+        "n": [1000, 100000],
+        "shapes": [(128, 128), (256, 256), (512, 512)],
+        "spins": [1000, 10000],
+        "steps": [200, 1000],
+    },
+    "large": {
+        "n": [1000, 100000, 1000000],
+        "shapes": [(256, 256), (512, 512), (1024, 1024), (2048, 2048)],
+        "spins": [10000, 100000],
+        "steps": [1000, 4000],
+    },
+}
+
+
+# ----------------------------
+# Cases
+# ----------------------------
+def cases(sizes):
+    """
+    Yields (name, params, setup, work, unit): setup() returns the function to time (built
+    outside the timing), work is the amount of work per call in `unit`.
+    """
+    rng = np.random.default_rng(0)
+
+    # single-spin calls, made once per sample / per tissue in the notebooks
+    for axis, rot in (("x", utils.rot_x), ("y", utils.rot_y), ("z", utils.rot_z)):
+        yield f"rot_{axis}", {"n": "scalar"}, lambda rot=rot: lambda: rot(30.0), 1, "matrices"
+
+    for repeats in (1, 2):
+
+        def abprop_chain(repeats=repeats):
+            ops = [utils.rot_x(30), np.array([[0.0], [0.0], [0.1]]), np.diag([0.9, 0.9, 0.95])]
+            return lambda: utils.abprop(*ops * repeats)
+
+        yield "abprop", {"operators": 3 * repeats}, abprop_chain, 1, "calls"
+
+    for n in sizes["n"]:
+        angles = rng.uniform(0, 360, n)
+        for axis, rot in (("x", utils.rot_x), ("y", utils.rot_y), ("z", utils.rot_z)):
+            yield f"rot_{axis}", {"n": n}, lambda rot=rot, angles=angles: lambda: rot(angles), n, "matrices"
+
+        A = np.broadcast_to(utils.rot_y(angles[:, None] % 10) * 0.99, (n, 1, 3, 3)).copy()
+        B = np.zeros((n, 1, 3))
+        B[..., 2] = 0.01
+        yield "abprop_batched", {"n": n}, lambda A=A, B=B: lambda: utils.abprop_batched(A, B), n, "tissues"
+
+        Mr = rng.normal(size=(n, 3))
+        Mc = utils.mr2mc(Mr)
+        yield "mr2mc", {"n": n}, lambda Mr=Mr: lambda: utils.mr2mc(Mr), n, "vectors"
+        yield "mc2mr", {"n": n}, lambda Mc=Mc: lambda: utils.mc2mr(Mc), n, "vectors"
+        yield "msinc", {"n": n}, lambda n=n: lambda: utils.msinc(n, 4), n, "samples"
+
+    for shape in sizes["shapes"]:
+        pixels = shape[0] * shape[1]
+        image = rng.random(shape)
+        F = utils_fft.fft_image(image)
+        params = {"shape": list(shape)}
+        yield "fft_image", params, lambda image=image: lambda: utils_fft.fft_image(image), pixels, "pixels"
+        yield "ifft_image", params, lambda F=F: lambda: utils_fft.ifft_image(F), pixels, "pixels"
+        cutoff = shape[0] // 8
+        yield (
+            "low_pass_filter",
+            params,
+            lambda F=F, cutoff=cutoff: lambda: utils_fft.low_pass_filter(F, cutoff),
+            pixels,
+            "pixels",
+        )
+        yield (
+            "high_pass_filter",
+            params,
+            lambda F=F, cutoff=cutoff: lambda: utils_fft.high_pass_filter(F, cutoff),
+            pixels,
+            "pixels",
+        )
+        yield (
+            "select_single_frequency",
+            params,
+            lambda F=F: lambda: utils_fft.select_single_frequency(F, 5, 3, 2),
+            pixels,
+            "pixels",
+        )
+
+    backends = ["numpy", "numba"] if kernels.HAVE_NUMBA else ["numpy"]
+    for n_spins in sizes["spins"]:
+        for n_steps in sizes["steps"]:
+            for backend in backends:
+
+                def slice_selection(n_spins=n_spins, n_steps=n_steps, backend=backend):
+                    # the excitation of 3b_2_rf_gradient.ipynb: a 90 degree msinc(N, TB / 4) pulse
+                    # with TB = 4 and its constant gradient
+                    TB = 4
+                    rf = 90 * utils.msinc(n_steps, TB / 4) / np.sum(utils.msinc(n_steps, TB / 4))
+                    gradient = np.pi * TB * 3 / n_steps
+                    z = np.linspace(-1, 1, n_spins)
+                    return lambda: simulate_rf_gradient(rf, gradient, z, T1=1e4, T2=1e3, backend=backend)
+
+                params = {"spins": n_spins, "steps": n_steps, "backend": backend}
+                yield "slice_selection", params, slice_selection, n_spins * n_steps, "spin-steps"
+
+
+# ----------------------------
+# Measurement
+# ----------------------------
+def measure(function, repeats, min_time):
+    """Best time per call over `repeats` rounds, each round running for at least min_time seconds."""
+    function()  # warm up caches (and JIT compilation)
+    best = np.inf
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def peak_memory(function):
+    """Peak traced allocation of one call in bytes, measured separately from the timings."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(args):
+    sizes = SIZES[args.sizes]
+    results = []
+    for name, params, setup, work, unit in cases(sizes):
+        if args.filter and not any(f in name for f in args.filter):
+            continue
+        function = setup()
+        seconds = measure(function, args.repeats, args.min_time)
+        peak = peak_memory(function)
+        result = {
+            "name": name,
+            "params": params,
+            "seconds": seconds,
+            "throughput": work / seconds,
+            "unit": f"{unit}/s",
+            "peak_memory_mb": peak / 2**20,
+        }
+        results.append(result)
+        print(format_result(result), flush=True)
+
+    report = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "numba": kernels.numba.__version__ if kernels.HAVE_NUMBA else None,
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"Saved {len(results)} results to {args.output}")
+
+
+def format_result(result):
+    params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+    label = f"{result['name']} [{params}]"
+    throughput = result["throughput"]
+    unit = result["unit"]
+    if unit == "pixels/s":
+        throughput, unit = throughput / 1e6, "MP/s"
+    seconds = result["seconds"]
+    peak = result["peak_memory_mb"]
+    return f"{label:<60} {seconds * 1e3:>10.3f} ms {throughput:>12.4g} {unit:<14} {peak:>9.2f} MB"
+
+
+# ----------------------------
+# Comparison
+# ----------------------------
+def key(result):
+    return result["name"], json.dumps(result["params"], sort_keys=True)
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = {key(r): r for r in json.load(f)["results"]}
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+
+    regressions = 0
+    print(f"{'case':<60} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for result in current:
+        old = baseline.get(key(result))
+        if old is None:
+            continue
+        ratio = result["seconds"] / old["seconds"]
+        flag = ""
+        if ratio > 1 + args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio < 1 - args.threshold:
+            flag = "  faster"
+        params = ", ".join(f"{k}={v}" for k, v in result["params"].items())
+        label = f"{result['name']} [{params}]"
+        print(f"{label:<60} {old['seconds'] * 1e3:>8.3f}ms {result['seconds'] * 1e3:>8.3f}ms {ratio:>7.2f}{flag}")
+    print(f"{regressions} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the simulation and FFT hot paths.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks.")
+    run_parser.add_argument("--sizes", choices=SIZES, default="default")
+    run_parser.add_argument("--filter", nargs="+", help="Only run cases whose name contains one of these.")
+    run_parser.add_argument("--repeats", type=int, default=3)
+    run_parser.add_argument("--min-time", type=float, default=0.1, help="Minimum seconds per round.")
+    run_parser.add_argument("--output", "-o", help="Path of the JSON results.")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two JSON results.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported.")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+        return 0
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
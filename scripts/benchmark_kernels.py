@@ -0,0 +1,52 @@
+import argparse
+import time
+
+import numpy as np
+
+from src import kernels
+from src.simulation import simulate_rf_gradient
+from src.utils import msinc
+
+
+def run(backend, rf, gradient, positions, T1, T2, dt, repeats):
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        M, _ = simulate_rf_gradient(rf, gradient, positions, T1=T1, T2=T2, dt=dt, backend=backend)
+        best = min(best, time.perf_counter() - start)
+    return M, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the numpy and numba RF + gradient simulation.")
+    parser.add_argument("--positions", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if not kernels.HAVE_NUMBA:
+        print("numba is not installed, only the numpy backend is available")
+        return
+
+    # the excitation of 3b_2_rf_gradient.ipynb: a 90 degree msinc(N, TB / 4) pulse with TB = 4
+    TB = 4
+    rf = 90 * msinc(args.steps, TB / 4) / np.sum(msinc(args.steps, TB / 4))
+    gradient = np.pi * TB * 3 / args.steps
+    dt = 1.0
+
+    # compile once outside of the timings
+    simulate_rf_gradient(rf[:2], gradient, np.zeros(1), T1=1e3, T2=1e2, backend="numba")
+
+    print(f"{'positions':>10} {'numpy [s]':>10} {'numba [s]':>10} {'speedup':>8} {'max |dM|':>10}")
+    for n in args.positions:
+        positions = np.linspace(-1, 1, n)
+        T1 = np.full(n, 1e4)
+        T2 = np.full(n, 1e3)
+        M_numpy, t_numpy = run("numpy", rf, gradient, positions, T1, T2, dt, args.repeats)
+        M_numba, t_numba = run("numba", rf, gradient, positions, T1, T2, dt, args.repeats)
+        error = np.max(np.abs(M_numpy - M_numba))
+        print(f"{n:>10} {t_numpy:>10.4f} {t_numba:>10.4f} {t_numpy / t_numba:>7.1f}x {error:>10.2e}")
+
+
+if __name__ == "__main__":
+    main()
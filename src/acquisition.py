@@ -0,0 +1,166 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+
+# ----------------------------
+# Trajectories
+# ----------------------------
+def cartesian_trajectory(shape, dwell=0.0):
+    """
+    Cartesian sampling of a whole k-space, in the centered layout of `utils_fft.fft_image`.
+    k is given in cycles per field of view, from -N/2 to N/2 - 1 along every axis.
+    Parameters:
+        shape (tuple): Image shape (rows, cols), rows are y and cols are x.
+        dwell (float): Time between two samples of one readout line (along x).
+
+    Returns:
+        tuple: kx, ky and the sample times after the echo, each of shape (rows * cols,).
+    """
+    rows, cols = shape
+    ky, kx = np.meshgrid(np.arange(rows) - rows // 2, np.arange(cols) - cols // 2, indexing="ij")
+    t = np.broadcast_to((np.arange(cols) - cols // 2) * dwell, shape)
+    return kx.ravel().astype(float), ky.ravel().astype(float), t.ravel()
+
+
+def radial_trajectory(n_spokes, n_readout, k_max=None, dwell=0.0, golden_angle=False):
+    """
+    Radial spokes through the center of k-space.
+    Parameters:
+        n_spokes (int): Number of spokes.
+        n_readout (int): Samples per spoke, also the default image size (k_max = n_readout / 2).
+        k_max (float): Largest k in cycles per field of view.
+        dwell (float): Time between two samples of a spoke, the echo is at the center.
+        golden_angle (bool): Use golden-angle instead of uniform spoke angles.
+
+    Returns:
+        tuple: kx, ky and sample times, each of shape (n_spokes * n_readout,).
+    """
+    k_max = n_readout / 2 if k_max is None else k_max
+    if golden_angle:
+        angles = np.arange(n_spokes) * np.pi * (np.sqrt(5) - 1) / 2
+    else:
+        angles = np.arange(n_spokes) * np.pi / n_spokes
+    radius = (np.arange(n_readout) - n_readout // 2) / (n_readout / 2) * k_max
+    kx = np.outer(np.cos(angles), radius)
+    ky = np.outer(np.sin(angles), radius)
+    t = np.broadcast_to((np.arange(n_readout) - n_readout // 2) * dwell, kx.shape)
+    return kx.ravel(), ky.ravel(), t.ravel()
+
+
+def spiral_trajectory(n_interleaves, n_readout, k_max, n_turns, dwell=0.0):
+    """
+    Archimedean spiral-out interleaves starting at the center of k-space.
+
+    Returns:
+        tuple: kx, ky and sample times (from the start of each interleave), each of shape
+            (n_interleaves * n_readout,).
+    """
+    s = np.arange(n_readout) / n_readout
+    radius = k_max * s
+    theta = 2 * np.pi * n_turns * s
+    offsets = 2 * np.pi * np.arange(n_interleaves) / n_interleaves
+    kx = radius * np.cos(theta + offsets[:, None])
+    ky = radius * np.sin(theta + offsets[:, None])
+    t = np.broadcast_to(np.arange(n_readout) * dwell, kx.shape)
+    return kx.ravel(), ky.ravel(), t.ravel()
+
+
+# ----------------------------
+# Signal simulation
+# ----------------------------
+def spin_echo_magnetization(pd, T1, T2, TR, TE):
+    """Transverse magnetization at the echo of a spin-echo sequence, PD (1 - exp(-TR/T1)) exp(-TE/T2)."""
+    return pd * (1 - np.exp(-TR / T1)) * np.exp(-TE / T2)
+
+
+def _segment_weights(t, n_segments):
+    """
+    Time segments and linear interpolation weights for exp(-t / T2) during the readout.
+    When the samples only use n_segments distinct times or fewer, the interpolation is exact.
+    """
+    unique = np.unique(t)
+    if len(unique) <= n_segments:
+        nodes = unique
+    else:
+        nodes = np.linspace(t.min(), t.max(), n_segments)
+    if len(nodes) == 1:
+        return nodes, np.ones((len(t), 1))
+    weights = np.zeros((len(t), len(nodes)))
+    index = np.clip(np.searchsorted(nodes, t, side="right") - 1, 0, len(nodes) - 2)
+    frac = (t - nodes[index]) / (nodes[index + 1] - nodes[index])
+    weights[np.arange(len(t)), index] = 1 - frac
+    weights[np.arange(len(t)), index + 1] = frac
+    return nodes, weights
+
+
+_worker_state = {}
+
+
+def _init_worker(segments, row_chunk):
+    _worker_state["segments"] = segments
+    _worker_state["row_chunk"] = row_chunk
+
+
+def _acquire_chunk(kx, ky, weights, segments=None, row_chunk=None):
+    """Signal of a chunk of samples, image rows are processed row_chunk at a time."""
+    if segments is None:
+        segments = _worker_state["segments"]
+        row_chunk = _worker_state["row_chunk"]
+    _, rows, cols = segments.shape
+    Ex = np.exp(-2j * np.pi * np.outer(kx, np.arange(cols)) / cols)
+    signal = np.zeros(len(kx), dtype=complex)
+    for start in range(0, rows, row_chunk):
+        y = np.arange(start, min(start + row_chunk, rows))
+        Ey = np.exp(-2j * np.pi * np.outer(ky, y) / rows)
+        for segment in range(len(segments)):
+            signal += weights[:, segment] * np.sum((Ey @ segments[segment, start : start + len(y)]) * Ex, axis=-1)
+    return signal
+
+
+def simulate_acquisition(M, kx, ky, t=None, T2=np.inf, chunk_size=4096, row_chunk=64, n_segments=8, workers=1):
+    """
+    Received signal of a 2D object along a k-space trajectory, by summing the phase of every voxel:
+    s(k) = sum_r M(r) exp(-t(k) / T2(r)) exp(-2 pi i (kx x / Nx + ky y / Ny)).
+    The phantom is on a grid, so the sum factorizes into matrix products over rows and columns,
+    computed for `chunk_size` samples x `row_chunk` image rows at a time. T2 decay during the
+    readout uses time segmentation with `n_segments` linearly interpolated segments (exact for
+    Cartesian trajectories with up to n_segments distinct sample times).
+    Parameters:
+        M (np.ndarray): Transverse magnetization at the echo, shape (rows, cols), e.g. from
+            `spin_echo_magnetization`.
+        kx (np.ndarray): k-space x coordinates in cycles per field of view.
+        ky (np.ndarray): k-space y coordinates in cycles per field of view.
+        t (np.ndarray): Time of every sample relative to the echo, None for no decay.
+        T2 (float or np.ndarray): T2 map for the decay during the readout.
+        chunk_size (int): Samples per chunk.
+        row_chunk (int): Image rows per chunk.
+        n_segments (int): Number of time segments for the readout decay.
+        workers (int): Number of processes the sample chunks are split over.
+
+    Returns:
+        np.ndarray: Complex signal of shape kx.shape. For `cartesian_trajectory` it reshapes to
+            the image shape and `utils_fft.ifft_image` reconstructs the image.
+    """
+    M = np.asarray(M, dtype=complex)
+    kx = np.asarray(kx, dtype=float).ravel()
+    ky = np.asarray(ky, dtype=float).ravel()
+    t = np.zeros(len(kx)) if t is None else np.asarray(t, dtype=float).ravel()
+    if len(kx) == 0:
+        return np.zeros(0, dtype=complex)
+
+    nodes, weights = _segment_weights(t, n_segments)
+    R2 = 1 / np.broadcast_to(np.asarray(T2, dtype=float), M.shape)
+    segments = np.stack([M * np.exp(-tau * R2) for tau in nodes])
+
+    starts = range(0, len(kx), chunk_size)
+    chunks = [(kx[s : s + chunk_size], ky[s : s + chunk_size], weights[s : s + chunk_size]) for s in starts]
+    if workers is None:
+        workers = os.cpu_count()
+    if workers <= 1:
+        parts = [_acquire_chunk(*chunk, segments=segments, row_chunk=row_chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(segments, row_chunk)) as executor:
+            parts = list(executor.map(_acquire_chunk, *zip(*chunks)))
+    return np.concatenate(parts)
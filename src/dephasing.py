@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class DephasingSimulation:
+    """
+    Spin ensemble under time-varying x/y gradients, the back end of the Qt spin dephasing demo.
+    The gradients are integrated into the k-space position k(t) = integral of G dt (gamma is folded
+    into G), and every voxel at (x, y) accumulates the phase kx * x + ky * y. Each voxel holds
+    `spins_per_voxel` isochromats with a Lorentzian off-resonance distribution, so the net voxel
+    magnetization decays with exp(-t / T2star); T2 additionally shrinks every isochromat.
+    """
+
+    def __init__(self, x, y, T2star=np.inf, T2=np.inf, spins_per_voxel=64, trail_length=512, seed=0):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.T2star = T2star
+        self.T2 = T2
+
+        # stratified Lorentzian quantiles, tan(pi * (u - 1/2)) / T2* has the density of a
+        # Lorentzian with half width 1 / T2*
+        if np.isfinite(T2star):
+            rng = np.random.default_rng(seed)
+            u = (np.arange(spins_per_voxel) + rng.random((len(self.x), spins_per_voxel))) / spins_per_voxel
+            self.off_resonance = np.tan(np.pi * (u - 0.5)) / T2star
+        else:
+            self.off_resonance = np.zeros((len(self.x), 1))
+
+        self.trail = np.zeros((trail_length, 2))
+        self.reset()
+
+    @property
+    def n_spins(self):
+        return self.off_resonance.size
+
+    def reset(self):
+        """Excitation: all isochromats in phase and back at the center of k-space."""
+        self.t = 0.0
+        self.kx = 0.0
+        self.ky = 0.0
+        self._trail_start = 0
+        self._trail_count = 0
+        self._push_trail()
+
+    def _push_trail(self):
+        index = (self._trail_start + self._trail_count) % len(self.trail)
+        self.trail[index] = self.kx, self.ky
+        if self._trail_count < len(self.trail):
+            self._trail_count += 1
+        else:
+            self._trail_start = (self._trail_start + 1) % len(self.trail)
+
+    def step(self, Gx, Gy, dt):
+        """Advances the ensemble by dt with constant gradients Gx, Gy."""
+        self.kx += Gx * dt
+        self.ky += Gy * dt
+        self.t += dt
+        self._push_trail()
+
+    def trajectory(self):
+        """Recent k-space positions in chronological order, shape (n, 2)."""
+        index = (self._trail_start + np.arange(self._trail_count)) % len(self.trail)
+        return self.trail[index]
+
+    def magnetization(self):
+        """Complex transverse magnetization of every voxel, shape (n_voxels,)."""
+        isochromats = np.exp(1j * self.t * self.off_resonance).mean(axis=-1)
+        M = np.exp(1j * (self.kx * self.x + self.ky * self.y)) * isochromats
+        if np.isfinite(self.T2):
+            M *= np.exp(-self.t / self.T2)
+        return M
+
+    def signal(self):
+        """Received signal, the mean magnetization of all voxels."""
+        return self.magnetization().mean()
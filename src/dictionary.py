@@ -0,0 +1,143 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from functools import partial
+
+import numpy as np
+
+from .epg import epg_grad, epg_relax, epg_rf, epg_state
+
+
+# ----------------------------
+# Signal models
+# ----------------------------
+def fisp_signal(T1, T2, B1, flips, TR, TI=None, n_states=25):
+    """
+    MR fingerprinting FISP signal of many tissues at once, simulated with the EPG engine.
+    Parameters:
+        T1 (np.ndarray): Longitudinal relaxation times of shape (n,).
+        T2 (np.ndarray): Transverse relaxation times of shape (n,).
+        B1 (np.ndarray): Relative transmit field of shape (n,), scales every flip angle.
+        flips (np.ndarray): Nominal flip angles in degrees, shape (n_tr,).
+        TR (float or np.ndarray): Repetition time(s), scalar or of shape (n_tr,).
+        TI (float): Inversion time of a preparation pulse, None for no inversion.
+        n_states (int): Number of dephasing orders kept.
+
+    Returns:
+        np.ndarray: Complex signal after every RF pulse, shape (n, n_tr).
+    """
+    T1, T2, B1 = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (T1, T2, B1)))
+    flips = np.asarray(flips, dtype=float)
+    TR = np.broadcast_to(np.asarray(TR, dtype=float), flips.shape)
+
+    FZ = epg_state(n_states, shape=T1.shape)
+    if TI is not None:
+        FZ = epg_grad(epg_relax(epg_rf(FZ, 180 * B1), T1, T2, TI))
+
+    signal = np.empty(T1.shape + flips.shape, dtype=complex)
+    for k in range(len(flips)):
+        FZ = epg_rf(FZ, flips[k] * B1)
+        signal[..., k] = FZ[..., 0, 0]
+        FZ = epg_grad(epg_relax(FZ, T1, T2, TR[k]))
+    return signal
+
+
+def parameter_grid(T1, T2, B1=(1.0,), t2_below_t1=True):
+    """
+    All (T1, T2, B1) combinations of the given values as an (n_entries, 3) array.
+    With t2_below_t1 the physically impossible entries T2 > T1 are dropped.
+    """
+    grid = np.stack(np.meshgrid(T1, T2, B1, indexing="ij"), axis=-1).reshape(-1, 3)
+    if t2_below_t1:
+        grid = grid[grid[:, 1] <= grid[:, 0]]
+    return grid
+
+
+# ----------------------------
+# Dictionary generation
+# ----------------------------
+def _simulate_chunk(simulate, params):
+    return simulate(*params.T)
+
+
+def build_dictionary(params, simulate, out=None, chunk_size=1024, workers=None, dtype=np.complex64, progress=True):
+    """
+    Evaluates a signal model for every parameter combination, chunk by chunk.
+    Chunks are spread over a `ProcessPoolExecutor` and written into a preallocated array as
+    soon as they finish, with at most two chunks per worker in flight, so memory stays bounded.
+    Parameters:
+        params (np.ndarray): Parameter combinations of shape (n_entries, n_params).
+        simulate (callable): Vectorized model `simulate(*params.T) -> (n, n_timepoints)`,
+            e.g. `functools.partial(fisp_signal, flips=..., TR=...)`. It must be picklable.
+        out (str or np.ndarray): Path of an `.npy` file (written through `open_memmap`) or a
+            preallocated array, None for an in-memory array.
+        chunk_size (int): Number of entries per chunk.
+        workers (int): Number of processes, None uses all cores and 1 runs in this process.
+        dtype (np.dtype): Storage type of the dictionary.
+        progress (bool or callable): Print progress and throughput, or call
+            `progress(done, total, entries_per_second)` after every chunk.
+
+    Returns:
+        np.ndarray: Dictionary of shape (n_entries, n_timepoints).
+    """
+    params = np.asarray(params, dtype=float)
+    n_entries = len(params)
+    starts = range(0, n_entries, chunk_size)
+    if workers is None:
+        workers = os.cpu_count()
+    if progress is True:
+        progress = _print_progress
+
+    t_start = time.perf_counter()
+    # the first chunk is simulated here to find the number of time points
+    first = _simulate_chunk(simulate, params[:chunk_size])
+    if out is None:
+        out = np.empty((n_entries, first.shape[-1]), dtype=dtype)
+    elif isinstance(out, (str, os.PathLike)):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=dtype, shape=(n_entries, first.shape[-1]))
+    out[: len(first)] = first
+
+    done = len(first)
+    if progress:
+        progress(done, n_entries, done / (time.perf_counter() - t_start))
+
+    if workers <= 1:
+        for start in starts[1:]:
+            chunk = _simulate_chunk(simulate, params[start : start + chunk_size])
+            out[start : start + len(chunk)] = chunk
+            done += len(chunk)
+            if progress:
+                progress(done, n_entries, done / (time.perf_counter() - t_start))
+    else:
+        task = partial(_simulate_chunk, simulate)
+        pending = {}
+        todo = iter(starts[1:])
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                while len(pending) < 2 * workers:
+                    start = next(todo, None)
+                    if start is None:
+                        break
+                    pending[executor.submit(task, params[start : start + chunk_size])] = start
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start = pending.pop(future)
+                    chunk = future.result()
+                    out[start : start + len(chunk)] = chunk
+                    done += len(chunk)
+                    if progress:
+                        progress(done, n_entries, done / (time.perf_counter() - t_start))
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    if progress is _print_progress:
+        print(file=sys.stderr)
+    return out
+
+
+def _print_progress(done, total, rate):
+    percent = 100 * done / total if total else 100.0
+    print(f"\r{done}/{total} entries ({percent:.1f}%), {rate:.0f} entries/s", end="", file=sys.stderr)
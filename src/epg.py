@@ -0,0 +1,148 @@
+import numpy as np
+
+from . import utils
+from .simulation import complex_rotation
+
+
+# ----------------------------
+# EPG state
+# ----------------------------
+def epg_state(n_states, M=None, shape=()):
+    """
+    Creates an Extended Phase Graph state. Row 0 holds F+, row 1 F- and row 2 Z,
+    the same basis as `utils.mr2mc`, and the columns are the dephasing orders 0..n_states-1.
+    Parameters:
+        n_states (int): Number of dephasing orders kept.
+        M (np.ndarray): Initial magnetization of shape (*shape, 3), defaults to [0, 0, 1].
+        shape (tuple): Leading batch shape, e.g. (n_tissues,).
+
+    Returns:
+        np.ndarray: Complex state of shape (*shape, 3, n_states).
+    """
+    FZ = np.zeros(tuple(shape) + (3, n_states), dtype=complex)
+    if M is None:
+        FZ[..., 2, 0] = 1
+    else:
+        M = np.broadcast_to(np.asarray(M, dtype=float), tuple(shape) + (3,))
+        utils.mr2mc(M, out=FZ[..., 0])
+    return FZ
+
+
+def epg_to_m(FZ):
+    """Magnetization (..., 3) of the order-0 states, converted back with `utils.mc2mr`."""
+    return utils.mc2mr(FZ[..., 0])
+
+
+# ----------------------------
+# EPG operators
+# ----------------------------
+def epg_rf(FZ, flip, phase=0):
+    """
+    RF mixing of all dephasing orders at once.
+    Parameters:
+        FZ (np.ndarray): State of shape (..., 3, n_states).
+        flip (float or np.ndarray): Flip angle in degrees, may be batched like the state (e.g. B1 maps).
+        phase (float or np.ndarray): RF phase in degrees, 0 rotates about x, 90 about y.
+
+    Returns:
+        np.ndarray: New state of the same shape.
+    """
+    return complex_rotation(utils.rot_rf(flip, phase)) @ FZ
+
+
+def epg_relax(FZ, T1, T2, t):
+    """
+    Relaxation of all dephasing orders for a duration t, with recovery of Z0 towards 1.
+    T1 and T2 may be arrays matching the leading batch shape of the state.
+    """
+    E1 = np.exp(-t / np.asarray(T1, dtype=float))[..., None]
+    E2 = np.exp(-t / np.asarray(T2, dtype=float))[..., None]
+    FZ = FZ.copy()
+    FZ[..., :2, :] *= E2[..., None]
+    FZ[..., 2, :] *= E1
+    FZ[..., 2, 0] += 1 - E1[..., 0]
+    return FZ
+
+
+def epg_grad(FZ, n=1):
+    """
+    Shifts the F states by n dephasing orders (negative n for a negative gradient).
+    The highest order is discarded, so the state size stays fixed.
+    """
+    FZ = FZ.copy()
+    for _ in range(abs(n)):
+        if n > 0:
+            FZ[..., 0, 1:] = FZ[..., 0, :-1].copy()
+            FZ[..., 1, :-1] = FZ[..., 1, 1:].copy()
+            FZ[..., 1, -1] = 0
+            FZ[..., 0, 0] = np.conj(FZ[..., 1, 0])
+        else:
+            FZ[..., 1, 1:] = FZ[..., 1, :-1].copy()
+            FZ[..., 0, :-1] = FZ[..., 0, 1:].copy()
+            FZ[..., 0, -1] = 0
+            FZ[..., 1, 0] = np.conj(FZ[..., 0, 0])
+    return FZ
+
+
+# ----------------------------
+# Sequences
+# ----------------------------
+def epg_cpmg(flip, n_echoes, T1, T2, esp, n_states=None):
+    """
+    CPMG echo train: 90 degree excitation about y followed by refocusing pulses about x.
+    Parameters:
+        flip (float or np.ndarray): Refocusing flip angle in degrees, a scalar or one per echo.
+        n_echoes (int): Number of echoes.
+        T1 (float or np.ndarray): Longitudinal relaxation time(s), arrays simulate many tissues at once.
+        T2 (float or np.ndarray): Transverse relaxation time(s).
+        esp (float): Echo spacing.
+        n_states (int): Number of dephasing orders, defaults to 2 * n_echoes + 1 (no truncation).
+
+    Returns:
+        np.ndarray: Complex echo amplitudes of shape (*batch_shape, n_echoes).
+    """
+    flip = np.broadcast_to(np.asarray(flip, dtype=float), (n_echoes,))
+    shape = np.broadcast_shapes(np.shape(T1), np.shape(T2))
+    if n_states is None:
+        n_states = 2 * n_echoes + 1
+
+    FZ = epg_rf(epg_state(n_states, shape=shape), 90, 90)
+    echoes = np.empty(shape + (n_echoes,), dtype=complex)
+    for k in range(n_echoes):
+        FZ = epg_grad(epg_relax(FZ, T1, T2, esp / 2))
+        FZ = epg_rf(FZ, flip[k], 0)
+        FZ = epg_grad(epg_relax(FZ, T1, T2, esp / 2))
+        echoes[..., k] = FZ[..., 0, 0]
+    return echoes
+
+
+def epg_gre(flip, TR, T1, T2, n_tr, rf_spoil_increment=0, n_states=None):
+    """
+    Gradient-spoiled gradient echo (FISP / FLASH) train, with one order of dephasing per TR.
+    rf_spoil_increment=0 gives the unspoiled (FISP) steady state, 117 degrees the RF-spoiled one.
+    Parameters:
+        flip (float or np.ndarray): Flip angle in degrees, a scalar or one per TR.
+        TR (float): Repetition time.
+        T1 (float or np.ndarray): Longitudinal relaxation time(s), arrays simulate many tissues at once.
+        T2 (float or np.ndarray): Transverse relaxation time(s).
+        n_tr (int): Number of repetitions.
+        rf_spoil_increment (float): Quadratic RF phase increment in degrees.
+        n_states (int): Number of dephasing orders, defaults to n_tr + 1 (no truncation).
+
+    Returns:
+        np.ndarray: Complex signal right after every RF pulse, demodulated by the RF phase,
+            of shape (*batch_shape, n_tr).
+    """
+    flip = np.broadcast_to(np.asarray(flip, dtype=float), (n_tr,))
+    shape = np.broadcast_shapes(np.shape(T1), np.shape(T2))
+    if n_states is None:
+        n_states = n_tr + 1
+
+    FZ = epg_state(n_states, shape=shape)
+    signal = np.empty(shape + (n_tr,), dtype=complex)
+    for k in range(n_tr):
+        phase = rf_spoil_increment * k * (k + 1) / 2
+        FZ = epg_rf(FZ, flip[k], phase)
+        signal[..., k] = FZ[..., 0, 0] * np.exp(-1j * np.deg2rad(phase))
+        FZ = epg_grad(epg_relax(FZ, T1, T2, TR))
+    return signal
@@ -1,4 +1,6 @@
+import threading
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk
 import tkinter.font as tkFont  # For adjusting default Tkinter fonts
 
@@ -17,7 +19,10 @@ from . import utils_fft as utils
 # Main Tkinter Application
 # ----------------------------
 class FrequencyFilterApp:
-    def __init__(self, root, image_path):
+    # Slider events arriving within one frame are coalesced into a single redraw
+    FRAME_MS = 16
+
+    def __init__(self, root, image_path, downsample=10):
         # -------------------------------
         # 1) Increase default Tkinter font
         # -------------------------------
@@ -34,8 +39,14 @@ class FrequencyFilterApp:
 
         # Load / create image and compute its FFT
         img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        self.img = cv2.resize(img, (img.shape[1] // 10, img.shape[0] // 10))
+        if downsample > 1:
+            img = cv2.resize(img, (img.shape[1] // downsample, img.shape[0] // downsample))
+        self.img = img
         self.F_shifted = utils.fft_image(self.img)
+        # log magnitude for display, a binary mask can be applied to it directly
+        self.kspace_log = np.log(1 + np.abs(self.F_shifted))
+        # reuses the previous reconstruction when the mask only changes slightly
+        self.reconstructor = utils.IncrementalReconstructor(self.F_shifted)
 
         # Prepare main frames
         self.control_frame = ttk.Frame(root, padding=5)
@@ -48,6 +59,7 @@ class FrequencyFilterApp:
         self.fig, self.axs = plt.subplots(1, 3, figsize=(12, 4))
         self.canvas = FigureCanvasTkAgg(self.fig, master=self.plot_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.init_plots()
 
         # UI: Filter Type
         self.filter_label = ttk.Label(self.control_frame, text="Filter Type:")
@@ -102,7 +114,17 @@ class FrequencyFilterApp:
             var_name="freq_y_var",
         )
 
+        # Filtering and reconstruction run on a worker thread, only the newest request is kept
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._request_id = 0
+        self._pending = None
+        self._frame = None
+        self._polling = False
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
         # Initial plot
+        self._after_id = None
         self.update_plot()
 
     def create_param_widget(self, label_text, from_, to, initial, callback, var_name):
@@ -148,10 +170,50 @@ class FrequencyFilterApp:
 
         entry.bind("<Return>", on_entry_return)
 
-    def update_plot(self, *args):
-        # Clear subplots
+    def init_plots(self):
+        """
+        Creates the image artists once. The original image is static, the filtered k-space,
+        the reconstruction and its title are animated and redrawn with blitting.
+        """
+        blank = np.zeros(self.img.shape)
+
+        # 1) Original Image
+        self.axs[0].imshow(self.img, cmap="gray", aspect="auto")
+        self.axs[0].set_title("Original Image")
+
+        # 2) Filtered K-space
+        self.kspace_image = self.axs[1].imshow(blank, cmap="gray", aspect="auto", animated=True)
+        self.axs[1].set_title("Filtered K-space")
+
+        # 3) Reconstructed Image
+        self.reconstructed_image = self.axs[2].imshow(blank, cmap="gray", aspect="auto", animated=True)
+        self.reconstructed_title = self.axs[2].set_title(" ", animated=True)
+
         for ax in self.axs:
-            ax.clear()
+            ax.axis("off")
+        self.fig.tight_layout()
+
+        # the background is (re)captured on every full draw, e.g. after a resize
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.draw_animated()
+
+    def draw_animated(self):
+        self.axs[1].draw_artist(self.kspace_image)
+        self.axs[2].draw_artist(self.reconstructed_image)
+        self.axs[2].draw_artist(self.reconstructed_title)
+
+    def update_plot(self, *args):
+        """Schedules a redraw, all requests until the next frame result in one recompute."""
+        if self._after_id is None:
+            self._after_id = self.root.after(self.FRAME_MS, self.render)
+
+    def render(self):
+        """Reads the controls and hands the computation to the worker, superseding older requests."""
+        self._after_id = None
 
         # Read UI controls
         ftype = self.filter_type.get()
@@ -159,37 +221,74 @@ class FrequencyFilterApp:
         fx = self.freq_x_var.get()
         fy = self.freq_y_var.get()
 
-        # Apply selected filter
+        # Select the mask of the filter
         if ftype == "Low-pass":
-            F_filt = utils.low_pass_filter(self.F_shifted, cutoff)
+            kind, params = "low-pass", (cutoff,)
             title = f"Low-pass (cutoff={cutoff})"
         elif ftype == "High-pass":
-            F_filt = utils.high_pass_filter(self.F_shifted, cutoff)
+            kind, params = "high-pass", (cutoff,)
             title = f"High-pass (cutoff={cutoff})"
         else:  # Single-freq
-            F_filt = utils.select_single_frequency(self.F_shifted, fx, fy, cutoff)
+            kind, params = "single-freq", (fx, fy, cutoff)
             title = f"Single-freq (fx={fx}, fy={fy}, band={cutoff})"
 
-        # Reconstruct image from filtered k-space
-        reconstructed = utils.ifft_image(F_filt)
-
-        # Convert to log magnitude for display (to avoid large dynamic range)
-        kspace_log = np.log(1 + np.abs(F_filt))
-
-        # 1) Original Image
-        self.axs[0].imshow(self.img, cmap="gray", aspect="auto")
-        self.axs[0].set_title("Original Image")
-        self.axs[0].axis("off")
-
-        # 2) Filtered K-space
-        self.axs[1].imshow(kspace_log, cmap="gray", aspect="auto")
-        self.axs[1].set_title("Filtered K-space")
-        self.axs[1].axis("off")
-
-        # 3) Reconstructed Image
-        self.axs[2].imshow(reconstructed, cmap="gray", aspect="auto")
-        self.axs[2].set_title(title)
-        self.axs[2].axis("off")
-
-        self.fig.tight_layout()
-        self.canvas.draw()
+        with self._lock:
+            self._request_id += 1
+            request_id = self._request_id
+        # a request that has not started yet is stale now
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self.executor.submit(self.compute, request_id, kind, params, title)
+
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.FRAME_MS, self.poll_frame)
+
+    def compute(self, request_id, kind, params, title):
+        """Runs on the worker thread, the results are picked up by `poll_frame` on the Tk thread."""
+        if request_id != self._request_id:
+            return
+
+        # Log magnitude of the filtered k-space, log(1 + |F * mask|) = log(1 + |F|) * mask
+        kspace_log = utils.apply_mask(self.kspace_log, kind, *params)
+
+        # Reconstruct image from filtered k-space, incrementally when possible
+        reconstructed = self.reconstructor.reconstruct(kind, *params)
+
+        with self._lock:
+            if request_id == self._request_id:
+                self._frame = (kspace_log, reconstructed, title)
+
+    def poll_frame(self):
+        """Draws the newest finished frame and keeps polling while the worker is busy."""
+        with self._lock:
+            frame, self._frame = self._frame, None
+        if frame is not None:
+            self.show_frame(*frame)
+
+        if self._pending is not None and not self._pending.done():
+            self.root.after(self.FRAME_MS, self.poll_frame)
+        else:
+            self._polling = False
+            with self._lock:
+                frame, self._frame = self._frame, None
+            if frame is not None:
+                self.show_frame(*frame)
+
+    def show_frame(self, kspace_log, reconstructed, title):
+        self.kspace_image.set_data(kspace_log)
+        self.kspace_image.set_clim(kspace_log.min(), kspace_log.max())
+        self.reconstructed_image.set_data(reconstructed)
+        self.reconstructed_image.set_clim(reconstructed.min(), reconstructed.max())
+        self.reconstructed_title.set_text(title)
+
+        if self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_animated()
+        self.canvas.blit(self.fig.bbox)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
@@ -0,0 +1,116 @@
+import numpy as np
+
+# optional JIT-compiled kernels, used when numba is installed, otherwise the
+# numpy implementations in `simulation` are used instead
+try:
+    import numba
+except ImportError:
+    numba = None
+
+HAVE_NUMBA = numba is not None
+
+
+def _jit(function):
+    if numba is None:
+        return function
+    return numba.njit(parallel=True, cache=True)(function)
+
+
+prange = range if numba is None else numba.prange
+
+
+def resolve_backend(backend):
+    """Maps "auto" to "numba" when it is installed (else "numpy") and checks the backend name."""
+    if backend == "auto":
+        return "numba" if HAVE_NUMBA else "numpy"
+    if backend not in ("numpy", "numba"):
+        raise ValueError(f"Unknown backend: {backend}")
+    if backend == "numba" and not HAVE_NUMBA:
+        raise ImportError("The numba backend requires numba to be installed")
+    return backend
+
+
+# spins per block of the fused kernel, the inner loop runs over the spins of a block
+BLOCK_SIZE = 256
+
+
+@_jit
+def bloch_rf_gradient_kernel(R, rf_on, positions, gradient, changed, dt, E1, E2, relax, M, frames, every):
+    """
+    Fused RF rotation, gradient precession and relaxation, updating M in place.
+    The spins are independent: blocks of `BLOCK_SIZE` spins run in parallel, and each block is
+    carried through all time steps in local arrays, with a branch-free inner loop over the
+    spins of the block that the compiler vectorizes. The precession is recomputed only on
+    steps where the gradient changed.
+    Parameters:
+        R (np.ndarray): Real RF rotation matrices of shape (n_steps, 3, 3).
+        rf_on (np.ndarray): Boolean of shape (n_steps,), False skips the rotation.
+        positions (np.ndarray): Spin positions of shape (n_positions, n_dims).
+        gradient (np.ndarray): Precession frequency per unit position, shape (n_steps, n_dims).
+        changed (np.ndarray): Boolean of shape (n_steps,), True where gradient[k] != gradient[k - 1].
+        dt (float): Duration of one step.
+        E1 (np.ndarray): exp(-dt / T1) of shape (n_positions,).
+        E2 (np.ndarray): exp(-dt / T2) of shape (n_positions,).
+        relax (bool): Apply relaxation.
+        M (np.ndarray): Magnetization of shape (n_positions, 3), overwritten with the result.
+        frames (np.ndarray): Recorded frames of shape (n_frames, n_positions, 3), may be empty.
+        every (int): Step interval of the recorded frames.
+    """
+    n_steps = R.shape[0]
+    n_positions, n_dims = positions.shape
+    n_frames = frames.shape[0]
+    n_blocks = (n_positions + BLOCK_SIZE - 1) // BLOCK_SIZE
+    for b in prange(n_blocks):
+        start = b * BLOCK_SIZE
+        n = min(BLOCK_SIZE, n_positions - start)
+        mx = M[start : start + n, 0].copy()
+        my = M[start : start + n, 1].copy()
+        mz = M[start : start + n, 2].copy()
+        e1 = E1[start : start + n].copy()
+        e2 = E2[start : start + n].copy()
+        c = np.ones(n)
+        s = np.zeros(n)
+        f = 0
+        countdown = every
+        for k in range(n_steps):
+            if changed[k]:
+                for j in range(n):
+                    theta = 0.0
+                    for d in range(n_dims):
+                        theta += positions[start + j, d] * gradient[k, d]
+                    c[j] = np.cos(theta * dt)
+                    s[j] = np.sin(theta * dt)
+            if rf_on[k]:
+                r00, r01, r02 = R[k, 0, 0], R[k, 0, 1], R[k, 0, 2]
+                r10, r11, r12 = R[k, 1, 0], R[k, 1, 1], R[k, 1, 2]
+                r20, r21, r22 = R[k, 2, 0], R[k, 2, 1], R[k, 2, 2]
+                for j in range(n):
+                    x = r00 * mx[j] + r01 * my[j] + r02 * mz[j]
+                    y = r10 * mx[j] + r11 * my[j] + r12 * mz[j]
+                    z = r20 * mx[j] + r21 * my[j] + r22 * mz[j]
+                    mx[j] = c[j] * x - s[j] * y
+                    my[j] = s[j] * x + c[j] * y
+                    mz[j] = z
+            else:
+                for j in range(n):
+                    x = mx[j]
+                    mx[j] = c[j] * x - s[j] * my[j]
+                    my[j] = s[j] * x + c[j] * my[j]
+            if relax:
+                for j in range(n):
+                    mx[j] *= e2[j]
+                    my[j] *= e2[j]
+                    mz[j] = mz[j] * e1[j] + 1 - e1[j]
+            countdown -= 1
+            if countdown == 0:
+                countdown = every
+                if f < n_frames:
+                    for j in range(n):
+                        frames[f, start + j, 0] = mx[j]
+                        frames[f, start + j, 1] = my[j]
+                        frames[f, start + j, 2] = mz[j]
+                    f += 1
+        for j in range(n):
+            M[start + j, 0] = mx[j]
+            M[start + j, 1] = my[j]
+            M[start + j, 2] = mz[j]
@@ -0,0 +1,151 @@
+import numpy as np
+
+
+# ----------------------------
+# Dictionary compression
+# ----------------------------
+def svd_basis(D, rank=None, energy=0.9999, chunk_size=65536):
+    """
+    Temporal SVD basis of a dictionary, from the Gram matrix D^H D accumulated chunk by chunk
+    so that memory-mapped dictionaries never have to be loaded at once.
+    Parameters:
+        D (np.ndarray): Dictionary of shape (n_entries, n_timepoints).
+        rank (int): Number of basis vectors, None picks the smallest rank keeping `energy`.
+        energy (float): Fraction of the dictionary energy kept when rank is None.
+        chunk_size (int): Number of entries per chunk.
+
+    Returns:
+        np.ndarray: Orthonormal basis of shape (n_timepoints, rank).
+    """
+    n_t = D.shape[-1]
+    G = np.zeros((n_t, n_t), dtype=complex)
+    for start in range(0, len(D), chunk_size):
+        chunk = np.asarray(D[start : start + chunk_size], dtype=complex)
+        G += chunk.conj().T @ chunk
+    s, V = np.linalg.eigh(G)
+    s, V = s[::-1], V[:, ::-1]
+    if rank is None:
+        kept = np.cumsum(s) / np.sum(s)
+        rank = int(np.searchsorted(kept, energy) + 1)
+    return V[:, :rank]
+
+
+def compress(signals, basis):
+    """Projects signals (..., n_timepoints) onto the basis, giving coefficients (..., rank)."""
+    return signals @ basis
+
+
+# ----------------------------
+# Matching
+# ----------------------------
+class DictionaryMatcher:
+    """
+    Matches measured time courses to a simulated dictionary in the SVD-compressed domain.
+    The atoms are compressed and normalized once and stored as complex64. Voxels are matched in
+    blocks against blocks of atoms in the same precision, so the score matrix never exceeds
+    (block_size, atom_block_size) complex64 values (64 MB at the defaults) and memory use does
+    not depend on the image size. With `coarse_stride` the parameters must lie on a (possibly
+    incomplete) grid, every voxel is first matched against every `coarse_stride`-th grid point
+    and then only against the fine atoms around its coarse winner.
+    """
+
+    def __init__(self, D, params, rank=None, energy=0.9999, block_size=1024, atom_block_size=8192, coarse_stride=None):
+        self.params = np.asarray(params, dtype=float)
+        if self.params.ndim == 1:
+            self.params = self.params[:, None]
+        self.block_size = block_size
+        self.atom_block_size = atom_block_size
+
+        self.basis = svd_basis(D, rank=rank, energy=energy)
+        self.atoms = np.empty((len(D), self.basis.shape[1]), dtype=np.complex64)
+        for start in range(0, len(D), atom_block_size):
+            chunk = np.asarray(D[start : start + atom_block_size])
+            self.atoms[start : start + atom_block_size] = compress(chunk, self.basis)
+        self.norms = np.linalg.norm(self.atoms, axis=-1)
+        self.atoms /= np.where(self.norms > 0, self.norms, 1)[:, None]
+
+        self.coarse_ids = None
+        if coarse_stride is not None:
+            self._build_coarse_index(coarse_stride)
+
+    def _build_coarse_index(self, stride):
+        axes = []
+        grid_index = []
+        for column in self.params.T:
+            values, inverse = np.unique(column, return_inverse=True)
+            axes.append(values)
+            grid_index.append(inverse)
+        grid_index = np.stack(grid_index, axis=-1)
+        lookup = np.full([len(values) for values in axes], -1, dtype=np.int64)
+        lookup[tuple(grid_index.T)] = np.arange(len(self.params))
+
+        on_coarse_grid = np.all(grid_index % stride == 0, axis=-1)
+        self.coarse_ids = np.flatnonzero(on_coarse_grid)
+        self.neighbours = {}
+        for c in self.coarse_ids:
+            window = tuple(slice(max(i - stride, 0), i + stride + 1) for i in grid_index[c])
+            ids = lookup[window].ravel()
+            self.neighbours[c] = ids[ids >= 0]
+
+    def _search(self, Sc, ids=None):
+        """Best atom (among ids, all atoms if None) and its score for every compressed signal."""
+        n_atoms = len(self.atoms) if ids is None else len(ids)
+        best = np.zeros(len(Sc), dtype=np.int64)
+        best_score = np.full(len(Sc), -np.inf)
+        # scores in the precision of the atoms, a complex128 product would double the block memory
+        Sc = Sc.astype(self.atoms.dtype, copy=False)
+        for start in range(0, n_atoms, self.atom_block_size):
+            if ids is None:
+                atoms = self.atoms[start : start + self.atom_block_size]
+                atom_ids = np.arange(start, start + len(atoms))
+            else:
+                atom_ids = ids[start : start + self.atom_block_size]
+                atoms = self.atoms[atom_ids]
+            scores = np.abs(Sc @ atoms.conj().T)
+            winner = np.argmax(scores, axis=-1)
+            score = scores[np.arange(len(Sc)), winner]
+            better = score > best_score
+            best[better] = atom_ids[winner[better]]
+            best_score[better] = score[better]
+        return best
+
+    def match_index(self, signals):
+        """
+        Index of the best matching atom for every time course.
+        Parameters:
+            signals (np.ndarray): Measured time courses of shape (..., n_timepoints).
+
+        Returns:
+            tuple: Atom indices of shape (...) and proton density (complex) of shape (...).
+        """
+        signals = np.asarray(signals)
+        shape = signals.shape[:-1]
+        signals = signals.reshape(-1, signals.shape[-1])
+        index = np.empty(len(signals), dtype=np.int64)
+        pd = np.empty(len(signals), dtype=complex)
+
+        for start in range(0, len(signals), self.block_size):
+            Sc = compress(signals[start : start + self.block_size], self.basis)
+            if self.coarse_ids is None:
+                best = self._search(Sc)
+            else:
+                coarse = self._search(Sc, self.coarse_ids)
+                best = np.empty_like(coarse)
+                for c in np.unique(coarse):
+                    voxels = np.flatnonzero(coarse == c)
+                    best[voxels] = self._search(Sc[voxels], self.neighbours[c])
+            ip = np.sum(Sc * self.atoms[best].conj(), axis=-1)
+            index[start : start + len(best)] = best
+            pd[start : start + len(best)] = ip / np.where(self.norms[best] > 0, self.norms[best], 1)
+
+        return index.reshape(shape), pd.reshape(shape)
+
+    def match(self, signals):
+        """
+        Parameter maps of the best matching atoms, e.g. T1/T2(/B1) maps for a `parameter_grid` dictionary.
+
+        Returns:
+            tuple: Parameters of shape (..., n_params) and proton density of shape (...).
+        """
+        index, pd = self.match_index(signals)
+        return self.params[index], pd
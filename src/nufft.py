@@ -0,0 +1,143 @@
+import numpy as np
+import scipy.fft
+import scipy.sparse
+
+from .utils_fft import FFT_WORKERS
+
+
+# ----------------------------
+# Kaiser-Bessel kernel
+# ----------------------------
+def kaiser_bessel_beta(width, oversampling):
+    """Kaiser-Bessel shape parameter with minimal aliasing for a kernel width and grid oversampling (Beatty 2005)."""
+    return np.pi * np.sqrt((width / oversampling * (oversampling - 0.5)) ** 2 - 0.8)
+
+
+def kaiser_bessel_table(width, oversampling, table_size=1024):
+    """
+    Kaiser-Bessel kernel sampled `table_size` times per grid unit on [0, width / 2],
+    followed by a zero so that distances beyond the kernel look up 0.
+    """
+    beta = kaiser_bessel_beta(width, oversampling)
+    u = np.arange(int(table_size * width / 2) + 1) / table_size
+    table = np.i0(beta * np.sqrt(np.clip(1 - (2 * u / width) ** 2, 0, None))) / width
+    return np.append(table, 0.0)
+
+
+# ----------------------------
+# Gridding reconstruction
+# ----------------------------
+class NufftPlan:
+    """
+    Gridding reconstruction (adjoint non-uniform FFT) for a fixed 2D trajectory.
+    k is in cycles per field of view, like in `acquisition`, and images use the same layout
+    as `utils_fft.ifft_image`. Every sample is spread onto a `oversampling` times finer grid
+    with a Kaiser-Bessel kernel of `width` grid points, read from a precomputed table. The
+    interpolation weights of the whole trajectory are stored once as a sparse (grid x samples)
+    matrix, so reconstructing further frames or coils costs one sparse product and one FFT.
+    The roll-off of the kernel is divided out (deapodization) after the FFT.
+    """
+
+    def __init__(self, kx, ky, shape, oversampling=2.0, width=4, table_size=1024, density=None, n_iter=10):
+        self.shape = tuple(shape)
+        self.kx = np.asarray(kx, dtype=float).ravel()
+        self.ky = np.asarray(ky, dtype=float).ravel()
+        self.n_samples = len(self.kx)
+        self.grid_shape = tuple(int(np.ceil(oversampling * n / 2)) * 2 for n in self.shape)
+        self.width = width
+        self.table_size = table_size
+        self.table = kaiser_bessel_table(width, oversampling, table_size)
+
+        # the image is reconstructed centered on x = 0, which is where the deapodization is
+        # accurate, and moved back to the 0..N-1 layout by a linear phase on the samples
+        rows, cols = self.shape
+        self.phase = np.exp(2j * np.pi * (self.kx * (cols // 2) / cols + self.ky * (rows // 2) / rows))
+
+        grid_y, weight_y = self._neighbours(self.ky * self.grid_shape[0] / rows, self.grid_shape[0])
+        grid_x, weight_x = self._neighbours(self.kx * self.grid_shape[1] / cols, self.grid_shape[1])
+        grid_index = (grid_y[:, :, None] * self.grid_shape[1] + grid_x[:, None, :]).ravel()
+        weights = (weight_y[:, :, None] * weight_x[:, None, :]).ravel()
+        sample_index = np.repeat(np.arange(self.n_samples), width * width)
+        self.interpolation = scipy.sparse.csr_matrix(
+            (weights, (grid_index, sample_index)), shape=(np.prod(self.grid_shape), self.n_samples)
+        )
+
+        apodization = np.outer(self._apodization(0), self._apodization(1))
+        self.kernel_area = apodization[rows // 2, cols // 2]
+        self.deapodization = 1 / apodization
+        if density is None:
+            density = self.pipe_menon_density(n_iter)
+        self.density = np.broadcast_to(np.asarray(density, dtype=float), self.kx.shape)
+
+    def _lookup(self, distance):
+        index = np.minimum(np.rint(np.abs(distance) * self.table_size).astype(np.int64), len(self.table) - 1)
+        return self.table[index]
+
+    def _neighbours(self, u, n_grid):
+        """Grid indices (wrapped to FFT order) and kernel weights of the `width` grid points around every u."""
+        start = np.ceil(u - self.width / 2).astype(np.int64)
+        points = start[:, None] + np.arange(self.width)
+        return points % n_grid, self._lookup(u[:, None] - points)
+
+    def _apodization(self, axis):
+        """Fourier transform of the (tabulated) kernel over the image positions -N/2..N/2-1 along an axis."""
+        n, n_grid = self.shape[axis], self.grid_shape[axis]
+        u = (np.arange(-len(self.table) + 1, len(self.table))) / self.table_size
+        x = np.arange(n) - n // 2
+        return np.cos(2 * np.pi * np.outer(x, u) / n_grid) @ self._lookup(u) / self.table_size
+
+    def pipe_menon_density(self, n_iter=10):
+        """
+        Density compensation by the fixed-point iteration w <- w / (C^T C w) (Pipe and Menon 1999),
+        with C the interpolation matrix. At convergence the gridded density is 1 / kernel area, the
+        weights are rescaled to k-space area per sample in cycles per field of view. The scale holds
+        where samples are dense on the oversampled grid (e.g. the center of radial and spiral
+        trajectories). A fully sampled Cartesian trajectory has one sample every `oversampling`
+        grid points, where the kernel sums are aliased: its weights are about 0.914 at the default
+        oversampling 2 and width 4, and within 1% of 1 for width 6 or oversampling 1.5.
+        """
+        C = self.interpolation
+        w = np.ones(self.n_samples)
+        for _ in range(n_iter):
+            w /= C.T @ (C @ w)
+        return w * self.kernel_area**2 * np.prod(self.shape) / np.prod(self.grid_shape)
+
+    def adjoint(self, data, density=True):
+        """
+        Gridding reconstruction of k-space data sampled on the trajectory.
+        Parameters:
+            data (np.ndarray): Samples of shape (..., n_samples), leading axes are frames / coils.
+            density (bool): Apply the density compensation weights.
+
+        Returns:
+            np.ndarray: Complex images of shape (..., rows, cols), scaled like np.fft.ifft2.
+        """
+        data = np.asarray(data)
+        batch = data.shape[:-1]
+        weighted = data.reshape(-1, self.n_samples) * self.phase
+        if density:
+            weighted = weighted * self.density
+        grid = (self.interpolation @ weighted.T).T.reshape(-1, *self.grid_shape)
+        images = scipy.fft.ifft2(grid, workers=FFT_WORKERS) * (np.prod(self.grid_shape) / np.prod(self.shape))
+
+        rows, cols = self.shape
+        row_index = (np.arange(rows) - rows // 2) % self.grid_shape[0]
+        col_index = (np.arange(cols) - cols // 2) % self.grid_shape[1]
+        images = images[:, row_index][:, :, col_index] * self.deapodization
+        return images.reshape(*batch, rows, cols)
+
+    def reconstruct(self, data):
+        """Magnitude images of density compensated data, comparable with `utils_fft.ifft_image`."""
+        return np.abs(self.adjoint(data))
+
+
+def direct_adjoint(kx, ky, data, shape, density=1.0):
+    """
+    Slow reference for `NufftPlan.adjoint`, the explicit sum over all samples
+    image(x, y) = sum_k w(k) s(k) exp(2 pi i (kx x / Nx + ky y / Ny)) / (Nx Ny).
+    """
+    rows, cols = shape
+    y, x = np.mgrid[:rows, :cols]
+    kx, ky = np.ravel(kx), np.ravel(ky)
+    E = np.exp(2j * np.pi * (np.outer(x.ravel(), kx) / cols + np.outer(y.ravel(), ky) / rows))
+    return (E @ (np.ravel(data) * density)).reshape(shape) / (rows * cols)
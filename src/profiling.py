@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+_NULL_CONTEXT = nullcontext()
+
+
+class _Stats:
+    __slots__ = ("calls", "seconds", "allocated", "peak")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocated = 0
+        self.peak = 0
+
+
+class _Stage:
+    """Timer (and allocation tracker) of one stage, the context manager returned by `Profiler.stage`."""
+
+    __slots__ = ("profiler", "name", "start", "memory_start", "child_peak")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.child_peak = 0
+        if self.profiler.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            stack = self.profiler._stack()
+            # the peak of the enclosing stage so far survives the reset through child_peak
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, peak)
+            stack.append(self)
+            self.memory_start = current
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        allocated = peak = 0
+        if self.profiler.memory:
+            current, traced_peak = tracemalloc.get_traced_memory()
+            traced_peak = max(traced_peak, self.child_peak)
+            allocated = current - self.memory_start
+            peak = traced_peak - self.memory_start
+            stack = self.profiler._stack()
+            stack.pop()
+            if stack:
+                stack[-1].child_peak = max(stack[-1].child_peak, traced_peak)
+        self.profiler._record(self.name, self.start, end, allocated, peak)
+        return False
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of simulation runs: call counts and inclusive time per stage,
+    and with memory=True the net and peak allocation per stage through `tracemalloc`.
+    Stages are the functions decorated with `instrument`, the blocks wrapped in `stage` and the
+    laps of a `lap_timer` (time and calls only).
+    While disabled, `stage` returns a shared no-op context and instrumented functions only
+    check one attribute, so the cost is close to zero.
+    Results are read with `summary()` or written as a Chrome trace (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.trace = True
+        self._started_tracemalloc = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.events = []
+            self._origin = time.perf_counter()
+
+    def enable(self, memory=False, trace=True):
+        """Starts recording, with memory=True also allocations, with trace=False no per-call trace events."""
+        self.memory = memory
+        self.trace = trace
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        else:
+            self._started_tracemalloc = False
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and self._started_tracemalloc:
+            tracemalloc.stop()
+        self.memory = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def stage(self, name):
+        """Context manager timing the enclosed block as the stage `name`."""
+        if not self.enabled:
+            return _NULL_CONTEXT
+        return _Stage(self, name)
+
+    def _record(self, name, start, end, allocated, peak):
+        with self._lock:
+            stats = self.stats.get(name)
+            if stats is None:
+                stats = self.stats[name] = _Stats()
+            stats.calls += 1
+            stats.seconds += end - start
+            stats.allocated += allocated
+            stats.peak = max(stats.peak, peak)
+            if self.trace:
+                self.events.append((name, start, end, threading.get_ident(), allocated))
+
+    def summary(self, sort="seconds"):
+        """Table of all stages: calls, total and mean time, and (with memory) net and peak allocation."""
+        rows = sorted(self.stats.items(), key=lambda item: getattr(item[1], sort), reverse=True)
+        width = max([len(name) for name in self.stats] + [5])
+        lines = [
+            f"{'stage':<{width}} {'calls':>9} {'total [ms]':>11} {'mean [us]':>10} {'net [MB]':>9} {'peak [MB]':>9}"
+        ]
+        for name, stats in rows:
+            lines.append(
+                f"{name:<{width}} {stats.calls:>9} {stats.seconds * 1e3:>11.3f} "
+                f"{stats.seconds / stats.calls * 1e6:>10.2f} {stats.allocated / 2**20:>9.2f} {stats.peak / 2**20:>9.2f}"
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """The recorded calls as a list of Chrome trace complete ("X") events."""
+        pid = os.getpid()
+        return [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": {"allocated_bytes": allocated} if self.memory else {},
+            }
+            for name, start, end, tid, allocated in self.events
+        ]
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.chrome_trace(), "displayTimeUnit": "ms"}, f)
+
+
+class LapTimer:
+    """
+    Splits a loop body into consecutive stages without a context manager per stage:
+    lap(name) ends the stage `name`, which began at the previous lap (or at creation).
+    """
+
+    __slots__ = ("profiler", "last")
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.profiler._record(name, self.last, now, 0, 0)
+        self.last = now
+
+
+# the profiler used by `instrument`, `stage` and `lap_timer`
+profiler = Profiler()
+
+
+def stage(name):
+    """Times the enclosed block as a stage of the global profiler (no-op while it is disabled)."""
+    return profiler.stage(name)
+
+
+def lap_timer():
+    """
+    LapTimer of the global profiler, or None while it is disabled, so that hot loops only pay
+    for an `if timer:` check, e.g. `if timer: timer.lap("relaxation")`.
+    """
+    return LapTimer(profiler) if profiler.enabled else None
+
+
+def instrument(function=None, name=None):
+    """Decorator recording every call of the function as a stage of the global profiler."""
+    if function is None:
+        return lambda function: instrument(function, name)
+    label = name or function.__name__
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return function(*args, **kwargs)
+        with _Stage(profiler, label):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def profile(memory=False, trace=True, summary=False, chrome_trace=None):
+    """
+    Enables the global profiler for the enclosed block, starting from empty statistics.
+    Parameters:
+        memory (bool): Also track allocations with tracemalloc (slows the run down considerably).
+        trace (bool): Keep every call for the Chrome trace, False keeps only the totals.
+        summary (bool): Print the summary table at the end.
+        chrome_trace (str): Path the Chrome trace JSON is written to at the end.
+
+    Returns:
+        Profiler: The global profiler, its results stay available after the block.
+    """
+    profiler.reset()
+    profiler.enable(memory=memory, trace=trace)
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if summary:
+            print(profiler.summary())
+        if chrome_trace is not None:
+            profiler.write_chrome_trace(chrome_trace)
@@ -1,16 +1,27 @@
-from PyQt5.QtCore import Qt
-from PyQt5.QtWidgets import QMainWindow, QWidget, QSlider, QGridLayout, QVBoxLayout, QGroupBox
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QMainWindow, QWidget, QSlider, QGridLayout, QVBoxLayout, QGroupBox, QPushButton
 
+from src.dephasing import DephasingSimulation
 from src.qt.widgets import KSpaceWidget, SpinWidget
 
 
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # The simulation advances on a fixed frame rate, independent of slider events
+    FPS = 30
+    # Simulated seconds per real second
+    TIME_SCALE = 0.5
+
+    def __init__(self, grid_size=21, T2star=2.0):
         super().__init__()
         self.setWindowTitle("Spin Dephasing Demo")
 
         self.kspace_widget = KSpaceWidget()
-        self.spin_widget = SpinWidget()
+        self.spin_widget = SpinWidget(grid_size=grid_size)
+
+        # Same phase scale as the static view: phase = (kx * x + ky * y) * 0.2
+        self.simulation = DephasingSimulation(
+            0.2 * self.spin_widget.spin_x, 0.2 * self.spin_widget.spin_y, T2star=T2star
+        )
 
         # Create QGroupBoxes with titles
         self.kspace_box = QGroupBox("K-Space")
@@ -36,6 +47,10 @@ class MainWindow(QMainWindow):
         self.slider_y.setValue(0)
         self.slider_y.valueChanged.connect(self.onGradUpdate)
 
+        # Re-excite: back to the center of k-space with all spins in phase
+        self.excite_button = QPushButton("Excite")
+        self.excite_button.clicked.connect(self.onExcite)
+
         # Main layout
         grid = QGridLayout()
         # Row 0: left slider (Gy), and group boxes (k-space, spins)
@@ -44,6 +59,7 @@ class MainWindow(QMainWindow):
         grid.addWidget(self.spins_box, 0, 2)
         # Row 1: horizontal slider for Gx
         grid.addWidget(self.slider_x, 1, 0, 1, 2)
+        grid.addWidget(self.excite_button, 1, 2)
 
         container = QWidget()
         container.setLayout(grid)
@@ -51,13 +67,28 @@ class MainWindow(QMainWindow):
 
         # Ensure an initial update
         self.onGradUpdate()
+        self.showSimulation()
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.onTick)
+        self.timer.start(1000 // self.FPS)
 
     def onGradUpdate(self):
-        Gx = self.slider_x.value()
-        Gy = self.slider_y.value()
+        # The gradients are only stored here, the timer integrates them
+        self.Gx = self.slider_x.value()
+        self.Gy = self.slider_y.value()
+
+    def onExcite(self):
+        self.simulation.reset()
+        self.showSimulation()
+
+    def onTick(self):
+        self.simulation.step(self.Gx, self.Gy, self.TIME_SCALE / self.FPS)
+        self.showSimulation()
 
+    def showSimulation(self):
         # Update K-space widget
-        self.kspace_widget.setKSpace(Gx, Gy)
+        self.kspace_widget.setKSpace(self.simulation.kx, self.simulation.ky, self.simulation.trajectory())
 
         # Update spin widget
-        self.spin_widget.setGradients(Gx, Gy)
+        self.spin_widget.setMagnetization(self.simulation.magnetization())
@@ -1,7 +1,68 @@
-import math
+import numpy as np
 from PyQt5.QtWidgets import QWidget
-from PyQt5.QtCore import Qt, QPointF
-from PyQt5.QtGui import QPainter, QPen, QBrush
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QImage, QPixmap, QPolygonF
+
+
+def arrow_segments(cx, cy, angle, length=15, head_size=6):
+    """
+    Line segments of arrows centered at (cx, cy) pointing in the direction 'angle' (radians),
+    for arrays of arrows at once: the shaft and the two arrowhead lines of every arrow.
+
+    Returns:
+        np.ndarray: Segment end points of shape (3 * n_arrows, 2, 2).
+    """
+    # Compute the end of the arrow, minus because y grows downward
+    ex = cx + length * np.cos(angle)
+    ey = cy - length * np.sin(angle)
+
+    # Arrowhead lines
+    left_head_angle = angle + np.radians(150)
+    right_head_angle = angle - np.radians(150)
+    lx = ex + head_size * np.cos(left_head_angle)
+    ly = ey - head_size * np.sin(left_head_angle)
+    rx = ex + head_size * np.cos(right_head_angle)
+    ry = ey - head_size * np.sin(right_head_angle)
+
+    start = np.stack([np.stack([cx, cy], axis=-1), np.stack([ex, ey], axis=-1), np.stack([ex, ey], axis=-1)], axis=1)
+    end = np.stack([np.stack([ex, ey], axis=-1), np.stack([lx, ly], axis=-1), np.stack([rx, ry], axis=-1)], axis=1)
+    return np.stack([start, end], axis=2).reshape(-1, 2, 2)
+
+
+def polygon_from_array(points):
+    """QPolygonF filled directly from an (n, 2) float array, without creating QPointF objects."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    polygon = QPolygonF(len(points))
+    if len(points):
+        buffer = polygon.data()
+        buffer.setsize(points.nbytes)
+        np.frombuffer(buffer, dtype=np.float64).reshape(-1, 2)[:] = points
+    return polygon
+
+
+def rasterize_segments(segments, width, height, color):
+    """
+    Aliased 1 px rasterization of many short line segments with numpy, every segment is sampled
+    at (longest segment extent + 1) evenly spaced points.
+    Parameters:
+        segments (np.ndarray): Segment end points in pixels of shape (n_segments, 2, 2).
+        width (int): Image width.
+        height (int): Image height.
+        color (int): ARGB32 value of the drawn pixels.
+
+    Returns:
+        np.ndarray: Premultiplied ARGB32 pixels of shape (height, width), transparent elsewhere.
+    """
+    pixels = np.zeros((height, width), dtype=np.uint32)
+    if len(segments) == 0:
+        return pixels
+    start = segments[:, 0]
+    delta = segments[:, 1] - start
+    t = np.linspace(0, 1, int(np.ceil(np.abs(delta).max())) + 1)
+    points = np.rint(start[:, None, :] + t[None, :, None] * delta[:, None, :]).astype(np.intp).reshape(-1, 2)
+    inside = (points[:, 0] >= 0) & (points[:, 0] < width) & (points[:, 1] >= 0) & (points[:, 1] < height)
+    pixels[points[inside, 1], points[inside, 0]] = color
+    return pixels
 
 
 class KSpaceWidget(QWidget):
@@ -13,11 +74,13 @@ class KSpaceWidget(QWidget):
         super().__init__(parent)
         self.kx = 0
         self.ky = 0
+        self.trail = None
 
-    def setKSpace(self, kx, ky):
-        """Update the k-space location and repaint."""
+    def setKSpace(self, kx, ky, trail=None):
+        """Update the k-space location (and optionally the (n, 2) trajectory trail) and repaint."""
         self.kx = kx
         self.ky = ky
+        self.trail = trail
         self.update()
 
     def paintEvent(self, event):
@@ -44,6 +107,15 @@ class KSpaceWidget(QWidget):
         px = (self.kx - k_min) / (k_max - k_min) * w
         py = (k_max - self.ky) / (k_max - k_min) * h
 
+        # Draw the trajectory that led to the current point
+        if self.trail is not None and len(self.trail) > 1:
+            trail = np.empty((len(self.trail), 2))
+            trail[:, 0] = (self.trail[:, 0] - k_min) / (k_max - k_min) * w
+            trail[:, 1] = (k_max - self.trail[:, 1]) / (k_max - k_min) * h
+            painter.setPen(QPen(Qt.gray, 1))
+            painter.drawPolyline(polygon_from_array(trail))
+            painter.setPen(pen)
+
         # Draw the point in k-space
         point_radius = 6
         painter.setBrush(QBrush(Qt.red))
@@ -53,33 +125,71 @@ class KSpaceWidget(QWidget):
         )
 
 
+# above this many line segments the arrows are rasterized with `rasterize_segments` instead of
+# drawLines, Qt rasterizes ~30k segments (a 100x100 grid) in 60-90 ms even without antialiasing
+DRAW_LINES_MAX_SEGMENTS = 4000
+
+
 class SpinWidget(QWidget):
     """
     Displays a grid of spins (arrows) that rotate/dephase based on
     the current gradients Gx, Gy. For simplicity, we set each spin's
     phase = (Gx * x + Gy * y).
+    All arrows are computed with numpy and drawn with a single drawLines call (rasterized with
+    numpy for dense grids, see `DRAW_LINES_MAX_SEGMENTS`), and the result is cached in a pixmap
+    until the spins or the size change.
+    With `setMagnetization` the arrows show simulated voxel magnetizations instead,
+    scaled by their magnitude.
     """
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, grid_size=21):
         super().__init__(parent)
         self.Gx = 0
         self.Gy = 0
 
         # Predefine spin positions in a grid
-        # e.g. from -5..5 in both x,y.
-        self.spin_positions = []
-        for i in range(-10, 11):  # -5 to 5 inclusive
-            for j in range(-10, 11):
-                self.spin_positions.append((i, j))
+        # from -10..10 in both x,y.
+        coords = np.linspace(-10, 10, grid_size)
+        x, y = np.meshgrid(coords, coords, indexing="ij")
+        self.spin_x = x.ravel()
+        self.spin_y = y.ravel()
+        self.grid_size = grid_size
+        self.phase = np.zeros(len(self.spin_x))
+        self.amplitude = np.ones(len(self.spin_x))
+
+        self._version = 0
+        self._pixmap = None
+        self._pixmap_key = None
 
     def setGradients(self, Gx, Gy):
         """Update the gradient values and repaint spins."""
         self.Gx = Gx
         self.Gy = Gy
+        self.phase = (self.Gx * self.spin_x + self.Gy * self.spin_y) * 0.2  # scale factor?
+        self.amplitude = np.ones(len(self.spin_x))
+        self._version += 1
+        self.update()
+
+    def setMagnetization(self, M):
+        """Show the complex magnetization of every grid position (e.g. from `DephasingSimulation`)."""
+        self.phase = np.angle(M)
+        self.amplitude = np.abs(M)
+        self._version += 1
         self.update()
 
     def paintEvent(self, event):
+        key = (self._version, self.width(), self.height())
+        if self._pixmap is None or self._pixmap_key != key:
+            self._pixmap = QPixmap(self.size())
+            painter = QPainter(self._pixmap)
+            self.drawSpins(painter)
+            painter.end()
+            self._pixmap_key = key
+
         painter = QPainter(self)
+        painter.drawPixmap(0, 0, self._pixmap)
+
+    def drawSpins(self, painter):
         painter.setRenderHint(QPainter.Antialiasing, True)
 
         # Draw background
@@ -97,44 +207,20 @@ class SpinWidget(QWidget):
         h = self.height()
         margin = 20
 
-        # For each spin, compute its phase due to Gx*x + Gy*y
-        for x, y in self.spin_positions:
-            phase = (self.Gx * x + self.Gy * y) * 0.2  # scale factor?
-
-            # Convert (x,y) to pixel coords
-            # assume -10..10 => margin..(w - margin)
-            px = margin + (x + 10) / 20.0 * (w - 2 * margin)
-            py = (h - margin) - (y + 10) / 20.0 * (h - 2 * margin)
-
-            # Draw arrow for the spin
-            self.drawArrow(painter, px, py, phase)
-
-    def drawArrow(self, painter, cx, cy, angle):
-        """
-        Draw a small arrow centered at (cx, cy) pointing
-        in the direction given by 'angle' (radians).
-        """
-        length = 15
-        head_size = 6
-
-        # Compute the end of the arrow
-        ex = cx + length * math.cos(angle)
-        ey = cy - length * math.sin(angle)  # minus because y grows downward
-
-        pen = QPen(Qt.blue, 2)
-        painter.setPen(pen)
-
-        # Draw the main shaft
-        painter.drawLine(int(cx), int(cy), int(ex), int(ey))
-
-        # Arrowhead lines
-        left_head_angle = angle + math.radians(150)
-        right_head_angle = angle - math.radians(150)
-
-        lx = ex + head_size * math.cos(left_head_angle)
-        ly = ey - head_size * math.sin(left_head_angle)
-        rx = ex + head_size * math.cos(right_head_angle)
-        ry = ey - head_size * math.sin(right_head_angle)
-
-        painter.drawLine(QPointF(ex, ey), QPointF(lx, ly))
-        painter.drawLine(QPointF(ex, ey), QPointF(rx, ry))
+        # Convert (x,y) to pixel coords
+        # assume -10..10 => margin..(w - margin)
+        px = margin + (self.spin_x + 10) / 20.0 * (w - 2 * margin)
+        py = (h - margin) - (self.spin_y + 10) / 20.0 * (h - 2 * margin)
+
+        # Shrink the arrows when the grid gets denser than the default one
+        spacing = min(w - 2 * margin, h - 2 * margin) / max(self.grid_size - 1, 1)
+        length = min(15, 0.8 * spacing)
+        head_size = length * 6 / 15
+
+        segments = arrow_segments(px, py, self.phase, length * self.amplitude, head_size * self.amplitude)
+        if len(segments) > DRAW_LINES_MAX_SEGMENTS:
+            pixels = rasterize_segments(segments, w, h, QColor(Qt.blue).rgba())
+            painter.drawImage(0, 0, QImage(pixels.data, w, h, 4 * w, QImage.Format_ARGB32_Premultiplied))
+        else:
+            painter.setPen(QPen(Qt.blue, 2 if length >= 10 else 1))
+            painter.drawLines(polygon_from_array(segments.reshape(-1, 2)))
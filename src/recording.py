@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+
+class TrajectoryRecorder:
+    """
+    Preallocated (n_frames, n_positions, 3) buffer for the magnetization of a simulation.
+    Every `every`-th step is kept (or only the last step with final_only=True), in memory or,
+    when a path is given, in a `.npy` file opened with `open_memmap` (any other suffix gives
+    a raw `np.memmap`), so long sequences on large phantoms run in constant memory.
+    Frames are read back lazily by indexing, e.g. `vis.plotM_animated(axs, recorder, z, frame)`.
+    """
+
+    def __init__(self, n_steps, n_positions, every=1, final_only=False, path=None, dtype=np.float64):
+        self.n_steps = n_steps
+        self.every = n_steps if final_only else every
+        self.final_only = final_only
+        n_frames = 1 if final_only else n_steps // every
+        shape = (n_frames, n_positions, 3)
+
+        if path is None:
+            self.frames = np.empty(shape, dtype=dtype)
+        elif os.fspath(path).endswith(".npy"):
+            self.frames = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        else:
+            self.frames = np.memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+    def frame(self, step):
+        """Writable frame for the (0-based) step, or None if the step is not recorded."""
+        if self.final_only:
+            return self.frames[0] if step == self.n_steps - 1 else None
+        if (step + 1) % self.every or (step + 1) // self.every > len(self.frames):
+            return None
+        return self.frames[(step + 1) // self.every - 1]
+
+    def record(self, step, M):
+        """Stores the magnetization (n_positions, 3) of the step if it is recorded."""
+        frame = self.frame(step)
+        if frame is not None:
+            frame[...] = M
+
+    def flush(self):
+        if isinstance(self.frames, np.memmap):
+            self.frames.flush()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        return self.frames[index]
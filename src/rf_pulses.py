@@ -0,0 +1,214 @@
+from functools import lru_cache
+
+import numpy as np
+import scipy.signal
+
+from .utils import msinc
+
+PULSE_SHAPES = ("sinc", "gaussian", "hard", "hsec", "slr")
+
+
+# ----------------------------
+# Waveforms
+# ----------------------------
+def _scale_to_flip(envelope, flip):
+    """Scales a real envelope so that its area (the small-tip flip angle) is flip degrees."""
+    return envelope * (flip / np.sum(envelope))
+
+
+def _hsec(N, beta=5.3, mu=4.9, adiabaticity=3.0):
+    """
+    Adiabatic hyperbolic secant inversion (Silver et al. 1984), amplitude B1max sech(beta t) and
+    phase mu log(sech(beta t)) for t in [-1, 1), i.e. a frequency sweep of -mu beta tanh(beta t).
+    The inverted band is 2 mu beta / pi cycles per pulse duration wide (about 16.5 at the
+    defaults). B1max is `adiabaticity` times the adiabatic threshold sqrt(mu) beta, so above 1
+    the inversion is insensitive to B1 (at 3 Mz < -0.99 for relative B1 from 0.7 to 1.5).
+    """
+    t = (np.arange(N) - N / 2 + 0.5) / (N / 2)
+    sech = 1 / np.cosh(beta * t)
+    # t advances by 2 / N per sample, so the threshold is sqrt(mu) beta 2 / N radians per sample
+    b1_max = adiabaticity * np.sqrt(mu) * beta * 2 / N
+    return np.rad2deg(b1_max * sech) * np.exp(1j * mu * np.log(sech))
+
+
+def _slr_ripples(d1, d2):
+    """Transition width (in units of TB) of a linear-phase filter with ripples d1, d2 (Pauly et al. 1991)."""
+    l1, l2 = np.log10(d1), np.log10(d2)
+    return (5.309e-3 * l1**2 + 7.114e-2 * l1 - 4.761e-1) * l2 + (-2.66e-3 * l1**2 - 5.941e-1 * l1 - 4.278e-1)
+
+
+def _min_phase(magnitude):
+    """Minimum-phase spectrum with the given magnitude (length n_fft), via the real cepstrum."""
+    n = len(magnitude)
+    cepstrum = np.fft.ifft(np.log(np.maximum(magnitude, 1e-12))).real
+    fold = np.zeros(n)
+    fold[0] = 1
+    fold[1 : (n + 1) // 2] = 2
+    if n % 2 == 0:
+        fold[n // 2] = 1
+    return np.exp(np.fft.fft(cepstrum * fold))
+
+
+def _ab2rf(a, b):
+    """Inverse SLR transform, the RF samples (radians, complex) of the Cayley-Klein polynomials a, b."""
+    n = len(b)
+    rf = np.zeros(n, dtype=complex)
+    a = a.astype(complex)
+    b = b.astype(complex)
+    for j in range(n - 1, -1, -1):
+        c = np.sqrt(1 / (1 + np.abs(b[j] / a[j]) ** 2))
+        s = np.conj(c * b[j] / a[j])
+        rf[j] = 2 * np.arctan2(np.abs(s), c) * np.exp(1j * np.angle(s))
+        if j > 0:
+            a, b = (c * a + s * b)[1 : j + 1], (-np.conj(s) * a + c * b)[:j]
+    return rf
+
+
+# ripples of the beta polynomial giving profile ripples d1, d2 (Pauly et al. 1991): small tip,
+# excitation (Mxy), inversion (Mz) and spin echo (beta^2)
+_SLR_RIPPLES = {
+    "st": lambda d1, d2: (d1, d2),
+    "ex": lambda d1, d2: (np.sqrt(d1 / 2), d2 / np.sqrt(2)),
+    "inv": lambda d1, d2: (d1 / 8, np.sqrt(d2 / 2)),
+    "se": lambda d1, d2: (d1 / 4, np.sqrt(d2)),
+}
+
+
+def _slr(N, TB, flip, d1=0.01, d2=0.01, kind=None):
+    """
+    Shinnar-Le Roux pulse: a linear-phase equiripple (Parks-McClellan) FIR beta polynomial,
+    scaled by sin(flip / 2), the minimum-phase alpha polynomial and the inverse SLR transform.
+    d1 and d2 are the passband and stopband ripples of the profile of `kind` ("st", "ex",
+    "inv" or "se"), which defaults to "inv" for flips of 150 degrees and more, else "ex".
+    The transition starts at the width estimated by `_slr_ripples` and is widened in 5% steps
+    until the beta polynomial meets its ripples.
+    """
+    if kind is None:
+        kind = "inv" if flip >= 150 else "ex"
+    d1, d2 = _SLR_RIPPLES[kind](d1, d2)
+    width = _slr_ripples(d1, d2) / TB
+    taps = N if N % 2 else N - 1
+    n_fft = 16 * N
+    f = 2 * np.abs(np.fft.fftfreq(n_fft))
+    while True:
+        edges = [0, (1 - width) * TB / N, (1 + width) * TB / N, 1]
+        h = scipy.signal.remez(taps, edges, [1, 0], weight=[1, d1 / d2], fs=2)
+        H = np.abs(np.fft.fft(h, n_fft))
+        passband_ok = np.max(np.abs(H[f <= edges[1]] - 1)) <= d1
+        if (passband_ok and np.max(H[f >= edges[2]]) <= d2) or (1 + 1.05 * width) * TB >= N:
+            break
+        width *= 1.05
+    b = np.zeros(N)
+    b[:taps] = h * np.sin(np.deg2rad(flip) / 2)
+
+    # |b| must not exceed 1 for alpha to exist, scaling b (not only its spectrum) keeps |a|^2 + |b|^2 = 1
+    b /= max(1.0, np.max(np.abs(np.fft.fft(b, n_fft))) * (1 + 1e-7))
+    B = np.fft.fft(b, n_fft)
+    a = np.fft.ifft(_min_phase(np.sqrt(1 - np.abs(B) ** 2)))[:N]
+    rf = _ab2rf(a[::-1], b)
+    return np.rad2deg(rf.real) if np.allclose(rf.imag, 0, atol=1e-9) else np.rad2deg(rf)
+
+
+@lru_cache(maxsize=256)
+def _waveform(shape, N, TB, flip, options):
+    if shape == "sinc":
+        # msinc spans +-ncyc sinc zero crossings, TB zero crossings need ncyc = TB / 2
+        rf = _scale_to_flip(msinc(N, TB / 2), flip)
+    elif shape == "gaussian":
+        # the FWHM bandwidth of exp(-t^2 / (2 sigma^2)) is TB / duration
+        sigma = N * np.sqrt(8 * np.log(2)) / (2 * np.pi * TB)
+        rf = _scale_to_flip(np.exp(-((np.arange(N) - (N - 1) / 2) ** 2) / (2 * sigma**2)), flip)
+    elif shape == "hard":
+        rf = np.full(N, flip / N)
+    elif shape == "hsec":
+        rf = _hsec(N, **dict(options))
+    elif shape == "slr":
+        rf = _slr(N, TB, flip, **dict(options))
+    else:
+        raise ValueError(f"Unknown pulse shape: {shape}")
+    rf.flags.writeable = False
+    return rf
+
+
+def rf_pulse(shape, N, TB=4, flip=90, b1=1.0, **options):
+    """
+    RF waveform of a parametric pulse, memoized by (shape, N, TB, flip, options).
+    Parameters:
+        shape (str): "sinc" (Hamming-windowed, `utils.msinc`), "gaussian", "hard", "hsec"
+            (adiabatic hyperbolic secant inversion, complex, options beta, mu and adiabaticity)
+            or "slr" (Shinnar-Le Roux, options d1 and d2 for the passband and stopband ripples
+            and the profile kind).
+        N (int): Number of samples.
+        TB (float): Time-bandwidth product (ignored by "hard" and "hsec", whose bandwidth is
+            set by beta and mu).
+        flip (float): Flip angle in degrees. Linear pulses are scaled to this area (their
+            small-tip flip angle), SLR pulses are designed for it. Ignored by "hsec", an
+            adiabatic inversion scaled by its B1max.
+        b1 (float): Relative transmit field, scales the returned waveform.
+        options: Shape-specific options.
+
+    Returns:
+        np.ndarray: Flip angle of every sample in degrees, shape (N,), in the convention of
+            `simulation.rf_rotations`: real samples rotate about y, complex samples
+            |rf| exp(i phase) about y turned by phase about z. The cached waveform is read-only
+            when b1 is 1.
+    """
+    rf = _waveform(shape, int(N), float(TB), float(flip), tuple(sorted(options.items())))
+    return rf if b1 == 1 else rf * b1
+
+
+# ----------------------------
+# Small-tip slice profiles
+# ----------------------------
+def small_tip_profiles(waveforms, n_fft=None):
+    """
+    Small-tip slice profiles of many waveforms at once, Mxy(f) = sum_n rf_n exp(-2 pi i f t_n)
+    with t measured from the pulse center, the Fourier transform of the waveform in radians.
+    Parameters:
+        waveforms (np.ndarray): RF waveforms in degrees of shape (..., N).
+        n_fft (int): FFT length, defaults to 8 N (zero-padded for a smooth profile).
+
+    Returns:
+        tuple: Frequencies (cycles per pulse duration, so the passband of a TB pulse is
+            |f| < TB / 2) of shape (n_fft,) and complex profiles of shape (..., n_fft).
+    """
+    waveforms = np.deg2rad(np.asarray(waveforms))
+    N = waveforms.shape[-1]
+    n_fft = 8 * N if n_fft is None else n_fft
+    spectrum = np.fft.fftshift(np.fft.fft(waveforms, n_fft, axis=-1), axes=-1)
+    k = np.arange(n_fft) - n_fft // 2
+    # move the time origin from the first sample to the pulse center
+    spectrum *= np.exp(2j * np.pi * k * (N - 1) / 2 / n_fft)
+    return k * N / n_fft, spectrum
+
+
+@lru_cache(maxsize=256)
+def _profile(shape, N, TB, flip, options, n_fft):
+    freqs, profile = small_tip_profiles(_waveform(shape, N, TB, flip, options), n_fft)
+    freqs.flags.writeable = False
+    profile.flags.writeable = False
+    return freqs, profile
+
+
+def slice_profile(shape, N, TB=4, flip=90, n_fft=None, **options):
+    """Cached small-tip profile of `rf_pulse(shape, N, TB, flip, **options)`, see `small_tip_profiles`."""
+    n_fft = 8 * int(N) if n_fft is None else int(n_fft)
+    return _profile(shape, int(N), float(TB), float(flip), tuple(sorted(options.items())), n_fft)
+
+
+def profile_errors(freqs, profiles, TB, transition=0.5):
+    """
+    Screening metrics of small-tip profiles of shape (..., n_fft): the largest relative deviation
+    from the center value in the passband |f| < TB / 2 - transition and the largest relative
+    leakage in the stopband |f| > TB / 2 + transition.
+
+    Returns:
+        tuple: Passband ripple and stopband leakage, each of shape (...,).
+    """
+    magnitude = np.abs(profiles)
+    center = magnitude[..., np.argmin(np.abs(freqs))][..., None]
+    passband = np.abs(freqs) < TB / 2 - transition
+    stopband = np.abs(freqs) > TB / 2 + transition
+    ripple = np.max(np.abs(magnitude[..., passband] / center - 1), axis=-1)
+    leakage = np.max(magnitude[..., stopband] / center, axis=-1)
+    return ripple, leakage
@@ -0,0 +1,204 @@
+from functools import lru_cache
+
+import numpy as np
+
+from . import utils
+from .steady_state import SteadyStateCache, relaxation_operator
+
+
+# ----------------------------
+# Events
+# ----------------------------
+class RF:
+    """Instantaneous RF rotation by flip degrees about the transverse axis at angle phase from x (`utils.rot_rf`)."""
+
+    def __init__(self, flip, phase=0):
+        self.flip = float(flip)
+        self.phase = float(phase)
+
+    def key(self):
+        return ("rf", self.flip, self.phase)
+
+
+class Delay:
+    """Free relaxation and off-resonance precession for a duration."""
+
+    def __init__(self, duration):
+        self.duration = float(duration)
+
+    def key(self):
+        return ("delay", self.duration)
+
+
+class Gradient:
+    """
+    Gradient lobe of a duration, during which spins relax and precess by area * position degrees
+    (area is the gradient moment in degrees per unit position) on top of the off-resonance.
+    """
+
+    def __init__(self, duration, area):
+        self.duration = float(duration)
+        self.area = float(area)
+
+    def key(self):
+        return ("gradient", self.duration, self.area)
+
+
+class Readout:
+    """Sampling point, the magnetization is recorded here."""
+
+    def __init__(self, name=None):
+        self.name = name
+
+    def key(self):
+        return ("readout", self.name)
+
+
+# ----------------------------
+# Compilation
+# ----------------------------
+class CompiledSequence:
+    """
+    A sequence as stacked steps, each step an RF rotation (the product of consecutive RF events,
+    identity if there is none) followed by one free segment that merges all consecutive delays
+    and gradients: relaxation and precession about z commute, so their durations and gradient
+    areas add up. Tissue-dependent operators of all steps are built in one vectorized call.
+    """
+
+    def __init__(self, keys):
+        rotations = []
+        durations = []
+        areas = []
+        self.readouts = []
+        self.readout_names = []
+
+        rotation = np.eye(3)
+        duration = area = 0.0
+        has_free = False
+
+        def close():
+            nonlocal rotation, duration, area, has_free
+            rotations.append(rotation)
+            durations.append(duration)
+            areas.append(area)
+            rotation = np.eye(3)
+            duration = area = 0.0
+            has_free = False
+
+        for key in keys:
+            kind = key[0]
+            if kind == "rf":
+                if has_free:
+                    close()
+                rotation = utils.rot_rf(key[1], key[2]) @ rotation
+            elif kind in ("delay", "gradient"):
+                duration += key[1]
+                area += key[2] if kind == "gradient" else 0.0
+                has_free = True
+            elif kind == "readout":
+                if has_free or not np.array_equal(rotation, np.eye(3)):
+                    close()
+                self.readouts.append(len(rotations))
+                self.readout_names.append(key[1])
+            else:
+                raise ValueError(f"Unknown event type: {kind}")
+        if has_free or not np.array_equal(rotation, np.eye(3)):
+            close()
+
+        self.rotations = np.array(rotations).reshape(-1, 3, 3)
+        self.durations = np.array(durations)
+        self.areas = np.array(areas)
+        for array in (self.rotations, self.durations, self.areas):
+            array.flags.writeable = False
+
+    @property
+    def n_steps(self):
+        return len(self.durations)
+
+    def operators(self, T1, T2, off_resonance=0, position=0):
+        """
+        Operators of every step for a batch of tissues, all parameters broadcast.
+        Parameters:
+            T1 (float or np.ndarray): Longitudinal relaxation time(s).
+            T2 (float or np.ndarray): Transverse relaxation time(s).
+            off_resonance (float or np.ndarray): Off-resonance precession in degrees per unit time.
+            position (float or np.ndarray): Spin position(s) for the gradient moments.
+
+        Returns:
+            tuple: A (..., n_steps, 3, 3) and B (..., n_steps, 3).
+        """
+        T1, T2, off_resonance, position = np.broadcast_arrays(
+            *(np.asarray(p, dtype=float) for p in (T1, T2, off_resonance, position))
+        )
+        angles = off_resonance[..., None] * self.durations + position[..., None] * self.areas
+        A, B = relaxation_operator(T1[..., None], T2[..., None], self.durations, angles)
+        return A @ self.rotations, B
+
+    def propagate(self, T1, T2, off_resonance=0, position=0):
+        """A (..., 3, 3) and B (..., 3) of the whole sequence, see `operators`."""
+        return utils.propagate_batched(*self.operators(T1, T2, off_resonance, position))
+
+    def steady_state(self, T1, T2, off_resonance=0, position=0):
+        """Steady-state magnetization (..., 3) at the start of the repeated sequence."""
+        return utils.steady_state(*self.propagate(T1, T2, off_resonance, position))
+
+    def signals(self, T1, T2, off_resonance=0, position=0, M=None):
+        """
+        Magnetization at every readout, starting from M (..., 3) or from the steady state.
+
+        Returns:
+            np.ndarray: Magnetization of shape (..., n_readouts, 3).
+        """
+        A, B = self.operators(T1, T2, off_resonance, position)
+        if M is None:
+            M = utils.steady_state(*utils.propagate_batched(A, B))
+        M = np.broadcast_to(np.asarray(M, dtype=float), B.shape[:-2] + (3,))
+        out = np.empty(B.shape[:-2] + (len(self.readouts), 3))
+        readout = 0
+        for k in range(self.n_steps + 1):
+            while readout < len(self.readouts) and self.readouts[readout] == k:
+                out[..., readout, :] = M
+                readout += 1
+            if k < self.n_steps:
+                M = (A[..., k, :, :] @ M[..., None])[..., 0] + B[..., k, :]
+        return out
+
+
+@lru_cache(maxsize=128)
+def _compile(keys):
+    return CompiledSequence(keys)
+
+
+class Sequence:
+    """
+    Declarative pulse sequence, a list of RF, Delay, Gradient and Readout events, e.g. the
+    inversion recovery of `3b_1_inversion_recovery.ipynb`:
+    Sequence([Delay(TR - TI - TE), RF(-180), Delay(TI), RF(-90), Delay(TE), Readout()]).
+    The events are compiled once into a `CompiledSequence`, cached per distinct sequence, and
+    evaluated for whole batches of tissues.
+    """
+
+    def __init__(self, events):
+        self.events = tuple(events)
+
+    def key(self):
+        return tuple(event.key() for event in self.events)
+
+    def compile(self):
+        return _compile(self.key())
+
+    def operators(self, T1, T2, off_resonance=0, position=0):
+        return self.compile().operators(T1, T2, off_resonance, position)
+
+    def propagate(self, T1, T2, off_resonance=0, position=0):
+        return self.compile().propagate(T1, T2, off_resonance, position)
+
+    def steady_state(self, T1, T2, off_resonance=0, position=0):
+        return self.compile().steady_state(T1, T2, off_resonance, position)
+
+    def signals(self, T1, T2, off_resonance=0, position=0, M=None):
+        return self.compile().signals(T1, T2, off_resonance, position, M)
+
+    def steady_state_cache(self, maxsize=65536):
+        """`SteadyStateCache` over (T1, T2, off_resonance, position) for this sequence."""
+        return SteadyStateCache(self.compile().propagate, maxsize=maxsize)
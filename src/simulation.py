@@ -0,0 +1,300 @@
+import numpy as np
+
+from . import kernels, utils
+from .profiling import instrument, lap_timer, stage
+from .recording import TrajectoryRecorder
+
+# transformation from real to complex, M -> [Mxy, conj(Mxy), Mz]
+T = np.array([[1, 1j, 0], [1, -1j, 0], [0, 0, 1]])
+T_inv = np.linalg.inv(T)
+
+
+def complex_rotation(R):
+    """
+    Moves (stacked) real rotation matrices into the complex basis of `utils.mr2mc`.
+    Parameters:
+        R (np.ndarray): Rotation matrices of shape (..., 3, 3).
+
+    Returns:
+        np.ndarray: T @ R @ inv(T) of shape (..., 3, 3).
+    """
+    return T @ R @ T_inv
+
+
+def rf_rotations(rf):
+    """
+    Rotation matrices of RF samples. A real sample rotates about y by its flip angle (the
+    convention of the notebooks), a complex sample |rf| exp(i phase) about y rotated by phase
+    about z, the axis (-sin(phase), cos(phase), 0).
+    Parameters:
+        rf (np.ndarray): Flip angle of every sample in degrees, real or complex, shape (n_steps,).
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (n_steps, 3, 3).
+    """
+    rf = np.asarray(rf)
+    if np.iscomplexobj(rf):
+        return utils.rot_rf(np.abs(rf), np.rad2deg(np.angle(rf)) + 90)
+    return utils.rot_y(rf.astype(float)).reshape(len(rf), 3, 3)
+
+
+@instrument
+def simulate_rf_gradient(
+    rf, gradient, positions, T1=np.inf, T2=np.inf, dt=1.0, M=None, record_every=None, recorder=None, backend="auto"
+):
+    """
+    Simulates an RF waveform played together with a gradient for all positions at once.
+    Every time step applies the RF rotation (see `rf_rotations`), the gradient precession and
+    relaxation, in the same order as the excitation loop of `3b_2_rf_gradient.ipynb`.
+    Parameters:
+        rf (np.ndarray): Flip angle of every sample in degrees, shape (n_steps,). Real samples
+            rotate about y, complex ones (e.g. `rf_pulses.rf_pulse("hsec", ...)`) carry their phase.
+        gradient (float or np.ndarray): Precession frequency per unit position in rad/s
+            (gamma * G), either constant, of shape (n_steps,) or (n_steps, n_dims).
+        positions (np.ndarray): Spin positions of shape (n_positions,) or (n_positions, n_dims).
+        T1 (float or np.ndarray): Longitudinal relaxation time(s), np.inf disables relaxation.
+        T2 (float or np.ndarray): Transverse relaxation time(s), np.inf disables relaxation.
+        dt (float): Duration of one sample in seconds.
+        M (np.ndarray): Initial magnetization of shape (n_positions, 3), defaults to [0, 0, 1].
+        record_every (int): Record the magnetization after every k-th step, None records
+            only the final state.
+        recorder (TrajectoryRecorder): Recorder to write the frames to instead, e.g. a
+            memory-mapped one, takes precedence over record_every.
+        backend (str): "numpy", "numba" (fused, parallel JIT kernel of `kernels`) or "auto",
+            which uses numba when it is installed.
+
+    Returns:
+        tuple: Final magnetization (n_positions, 3) and the recorded frames of shape
+            (n_frames, n_positions, 3), or None if nothing was recorded.
+    """
+    rf = np.asarray(rf)
+    if not np.iscomplexobj(rf):
+        rf = rf.astype(float)
+    n_steps = len(rf)
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim == 1:
+        positions = positions[:, None]
+    n_positions, n_dims = positions.shape
+    gradient = np.broadcast_to(np.asarray(gradient, dtype=float).reshape(-1, n_dims), (n_steps, n_dims))
+
+    if M is None:
+        M = np.zeros((n_positions, 3))
+        M[:, 2] = 1
+
+    E1 = np.exp(-dt / np.asarray(T1, dtype=float))
+    E2 = np.exp(-dt / np.asarray(T2, dtype=float))
+    relax = np.any(E1 != 1) or np.any(E2 != 1)
+
+    if recorder is None and record_every is not None:
+        recorder = TrajectoryRecorder(n_steps, n_positions, every=record_every)
+
+    if kernels.resolve_backend(backend) == "numba":
+        M = np.array(M, dtype=float, order="C")
+        changed = np.ones(n_steps, dtype=bool)
+        changed[1:] = np.any(gradient[1:] != gradient[:-1], axis=-1)
+        frames = np.empty((0, n_positions, 3)) if recorder is None else np.asarray(recorder.frames)
+        with stage("numba kernel"):
+            kernels.bloch_rf_gradient_kernel(
+                np.ascontiguousarray(rf_rotations(rf)),
+                rf != 0,
+                positions,
+                np.ascontiguousarray(gradient),
+                changed,
+                float(dt),
+                np.ascontiguousarray(np.broadcast_to(E1, n_positions)),
+                np.ascontiguousarray(np.broadcast_to(E2, n_positions)),
+                bool(relax),
+                M,
+                frames,
+                1 if recorder is None else recorder.every,
+            )
+        if recorder is None:
+            return M, None
+        recorder.flush()
+        return M, recorder.frames
+
+    # the state is a single real (n_positions, 3) buffer, worked on through the zero-copy split
+    # views Mxy = Mx + i My and Mz, and together with fixed scratch buffers the loop allocates nothing
+    state = np.array(M, dtype=float, order="C")
+    Mxy, Mz = utils.magnetization_views(state)
+    Mx = Mxy.real
+    angle = np.empty(n_positions)
+    phase = np.empty(n_positions, dtype=complex)
+    new_x = np.empty(n_positions)
+    scratch = np.empty(n_positions)
+    one_minus_E1 = 1 - E1
+
+    # RF rotations about y of the whole waveform, built once. A complex sample rotates about y
+    # turned by its phase, applied as a precession by -phase, the rotation about y and back
+    with stage("rotation building"):
+        rf_phase = np.exp(1j * np.angle(rf)) if np.iscomplexobj(rf) else None
+        flip = np.deg2rad(rf if rf_phase is None else np.abs(rf))
+        cos_flip = np.cos(flip)
+        sin_flip = np.sin(flip)
+
+    timer = lap_timer()
+    changed = True
+    for k in range(n_steps):
+        # piecewise-constant gradients reuse the previous precession factor
+        if k > 0:
+            changed = np.any(gradient[k] != gradient[k - 1])
+        if changed:
+            np.matmul(positions, gradient[k], out=angle)
+            angle *= dt
+            np.cos(angle, out=phase.real)
+            np.sin(angle, out=phase.imag)
+            if timer:
+                timer.lap("gradient phase")
+
+        if rf[k] != 0:
+            if rf_phase is not None:
+                Mxy *= np.conj(rf_phase[k])
+            # Mx' = cos Mx + sin Mz, Mz' = cos Mz - sin Mx, My is unchanged
+            np.multiply(Mx, cos_flip[k], out=new_x)
+            np.multiply(Mz, sin_flip[k], out=scratch)
+            new_x += scratch
+            np.multiply(Mx, sin_flip[k], out=scratch)
+            Mz *= cos_flip[k]
+            Mz -= scratch
+            Mx[...] = new_x
+            if rf_phase is not None:
+                Mxy *= rf_phase[k]
+        if timer:
+            timer.lap("rf rotation")
+        Mxy *= phase
+        if timer:
+            timer.lap("precession")
+
+        if relax:
+            Mxy *= E2
+            Mz *= E1
+            Mz += one_minus_E1
+            if timer:
+                timer.lap("relaxation")
+
+        frame = None if recorder is None else recorder.frame(k)
+        if frame is not None:
+            frame[...] = state
+            if timer:
+                timer.lap("recording")
+
+    if recorder is None:
+        return state, None
+    recorder.flush()
+    return state, recorder.frames
+
+
+# ----------------------------
+# Spinor (Cayley-Klein) mode
+# ----------------------------
+def cayley_klein(w):
+    """
+    Cayley-Klein parameters of rotations, in the same (right-handed) convention as `utils.rot_axis`.
+    Parameters:
+        w (np.ndarray): Rotation vectors of shape (..., 3) in radians.
+
+    Returns:
+        tuple: alpha and beta, complex arrays of shape (...,).
+    """
+    w = np.asarray(w, dtype=float)
+    phi = np.linalg.norm(w, axis=-1)
+    # sin(phi / 2) / phi, well defined for phi = 0
+    s = 0.5 * np.sinc(phi / (2 * np.pi))
+    alpha = np.cos(phi / 2) - 1j * w[..., 2] * s
+    beta = (w[..., 1] - 1j * w[..., 0]) * s
+    return alpha, beta
+
+
+def spinor_compose(alpha1, beta1, alpha2, beta2):
+    """Cayley-Klein parameters of the rotation (alpha1, beta1) followed by (alpha2, beta2)."""
+    return alpha2 * alpha1 - np.conj(beta2) * beta1, beta2 * alpha1 + np.conj(alpha2) * beta1
+
+
+def spinor_rotate(alpha, beta, M):
+    """
+    Applies the rotations given by (alpha, beta) to the magnetization.
+    Parameters:
+        alpha (np.ndarray): Cayley-Klein alpha of shape (...,).
+        beta (np.ndarray): Cayley-Klein beta of shape (...,).
+        M (np.ndarray): Magnetization of shape (..., 3).
+
+    Returns:
+        np.ndarray: Rotated magnetization of shape (..., 3).
+    """
+    Mxy = M[..., 0] + 1j * M[..., 1]
+    Mz = M[..., 2]
+    alpha_conj = np.conj(alpha)
+    Mxy_new = alpha_conj**2 * Mxy - beta**2 * np.conj(Mxy) + 2 * alpha_conj * beta * Mz
+    Mz_new = -2 * np.real(alpha_conj * np.conj(beta) * Mxy) + (np.abs(alpha) ** 2 - np.abs(beta) ** 2) * Mz
+    return np.stack([Mxy_new.real, Mxy_new.imag, Mz_new], axis=-1)
+
+
+def spinor_profiles(alpha, beta):
+    """
+    Slice profiles of a pulse from its final Cayley-Klein parameters.
+
+    Returns:
+        dict: "excitation" (complex Mxy from Mz = 1), "inversion" (Mz from Mz = 1)
+            and "refocusing" (spin-echo profile beta^2).
+    """
+    return {
+        "excitation": 2 * np.conj(alpha) * beta,
+        "inversion": 1 - 2 * np.abs(beta) ** 2,
+        "refocusing": beta**2,
+    }
+
+
+@instrument
+def simulate_rf_spinor(rf, gradient, positions, dt=1.0, M=None):
+    """
+    Spinor version of `simulate_rf_gradient`: every RF sample and gradient step is a pair of
+    Cayley-Klein parameters and the steps are composed with complex multiplies over all positions.
+    Relaxation is not modeled.
+    Parameters:
+        rf (np.ndarray): Flip angle of every sample in degrees, real or complex as in
+            `rf_rotations`, shape (n_steps,).
+        gradient (float or np.ndarray): Precession frequency per unit position in rad/s,
+            either constant, of shape (n_steps,) or (n_steps, n_dims).
+        positions (np.ndarray): Spin positions of shape (n_positions,) or (n_positions, n_dims).
+        dt (float): Duration of one sample in seconds.
+        M (np.ndarray): Initial magnetization of shape (n_positions, 3), defaults to [0, 0, 1].
+
+    Returns:
+        tuple: Final magnetization (n_positions, 3) and the profiles of `spinor_profiles`.
+    """
+    rf = np.asarray(rf)
+    n_steps = len(rf)
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim == 1:
+        positions = positions[:, None]
+    n_positions, n_dims = positions.shape
+    gradient = np.broadcast_to(np.asarray(gradient, dtype=float).reshape(-1, n_dims), (n_steps, n_dims))
+
+    # RF about y turned by the phase: alpha = cos(flip / 2), beta = sin(flip / 2) exp(i phase),
+    # composed as a 2x2 matrix on [alpha, beta]
+    half_flip = np.deg2rad(np.abs(rf)) / 2
+    c = np.cos(half_flip).astype(complex)
+    s = np.sin(half_flip) * np.exp(1j * np.angle(rf))
+    Q = np.stack([np.stack([c, -np.conj(s)], axis=-1), np.stack([s, c], axis=-1)], axis=-2)
+
+    state = np.zeros((2, n_positions), dtype=complex)
+    state[0] = 1
+    buffer = np.empty_like(state)
+    precession = None
+    for k in range(n_steps):
+        # precession about z: alpha = exp(-i phi / 2), beta = 0
+        if precession is None or np.any(gradient[k] != gradient[k - 1]):
+            precession = np.exp(-0.5j * (positions @ gradient[k]) * dt)
+            precession_conj = np.conj(precession)
+
+        if rf[k] != 0:
+            np.matmul(Q[k], state, out=buffer)
+            state, buffer = buffer, state
+        state[0] *= precession
+        state[1] *= precession_conj
+
+    alpha, beta = state
+    if M is None:
+        M = np.zeros((n_positions, 3))
+        M[:, 2] = 1
+    return spinor_rotate(alpha, beta, M), spinor_profiles(alpha, beta)
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from . import utils
+
+
+# ----------------------------
+# Sequence builders
+# ----------------------------
+def relaxation_operator(T1, T2, t, off_resonance=0):
+    """A (..., 3, 3) and B (..., 3) of free relaxation (and precession in degrees) for a duration t."""
+    E1 = np.exp(-t / T1)
+    E2 = np.exp(-t / T2)
+    E1, E2, off_resonance = np.broadcast_arrays(E1, E2, np.asarray(off_resonance, dtype=float))
+    A = np.zeros(E1.shape + (3, 3))
+    A[..., 0, 0] = E2
+    A[..., 1, 1] = E2
+    A[..., 2, 2] = E1
+    A = A @ utils.rot_z(off_resonance)
+    B = np.zeros(E1.shape + (3,))
+    B[..., 2] = 1 - E1
+    return A, B
+
+
+def inversion_recovery_operators(T1, T2, TI, TE, TR):
+    """
+    A and B of one inversion-recovery period as in `3b_1_inversion_recovery.ipynb`:
+    relaxation until the inversion, inversion, TI, 90 degree excitation and TE.
+    All parameters broadcast against each other.
+
+    Returns:
+        tuple: A (..., 3, 3) and B (..., 3) of the whole period.
+    """
+    T1, T2, TI, TE, TR = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in (T1, T2, TI, TE, TR)))
+    A3, B3 = relaxation_operator(T1, T2, TR - TI - TE)
+    A1, B1 = relaxation_operator(T1, T2, TI)
+    A2, B2 = relaxation_operator(T1, T2, TE)
+    A = np.stack([A3, A1 @ utils.rot_x(-180), A2 @ utils.rot_x(-90)], axis=-3)
+    B = np.stack([B3, B1, B2], axis=-2)
+    return utils.propagate_batched(A, B)
+
+
+def ssfp_operators(T1, T2, flip, TR, off_resonance=0):
+    """
+    A and B of one balanced SSFP period: RF about x, then relaxation and
+    off-resonance precession (in degrees per TR) over TR. All parameters broadcast.
+
+    Returns:
+        tuple: A (..., 3, 3) and B (..., 3), the steady state is the one right before the next RF.
+    """
+    A, B = relaxation_operator(np.asarray(T1, dtype=float), np.asarray(T2, dtype=float), TR, off_resonance)
+    return A @ utils.rot_x(flip), B
+
+
+# ----------------------------
+# Cached steady-state solver
+# ----------------------------
+class SteadyStateCache:
+    """
+    Memoized steady-state solver for one sequence builder.
+    `build(*params)` must accept broadcast parameter arrays and return stacked A (..., 3, 3)
+    and B (..., 3). Calls with a batch of parameters only build and solve the combinations
+    that are not cached yet, in a single batched solve, and the least recently used entries
+    are evicted once `maxsize` is exceeded.
+    """
+
+    def __init__(self, build, maxsize=65536):
+        self.build = build
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+
+    def __call__(self, *params):
+        """
+        Steady-state magnetization for (broadcast) sequence parameters.
+
+        Returns:
+            np.ndarray: Mss of shape (*broadcast_shape, 3).
+        """
+        params = np.broadcast_arrays(*(np.asarray(p, dtype=float) for p in params))
+        shape = params[0].shape
+        rows = np.stack([p.ravel() for p in params], axis=-1)
+        Mss = np.empty((len(rows), 3))
+
+        missing = {}
+        for i, row in enumerate(rows):
+            key = tuple(row.tolist())
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                Mss[i] = self._cache[key]
+                self.hits += 1
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            # every row is one lookup, as if each were a call of an lru_cache function: the first
+            # row of a missing key is a miss, its repeats within the batch are hits
+            self.misses += len(missing)
+            self.hits += sum(len(indices) for indices in missing.values()) - len(missing)
+            new = np.array(list(missing.keys()))
+            A, B = self.build(*new.T)
+            solved = utils.steady_state(A, B)
+            for key, m in zip(missing, solved):
+                Mss[missing[key]] = m
+                # a copy, a row view would keep the whole solved batch alive
+                self._cache[key] = m.copy()
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+        return Mss.reshape(shape + (3,))
+
+    def cache_info(self):
+        """Hits, misses, maximum and current size, like `functools.lru_cache`, counted per parameter combination."""
+        return {"hits": self.hits, "misses": self.misses, "maxsize": self.maxsize, "currsize": len(self._cache)}
+
+    def cache_clear(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
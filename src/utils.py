@@ -1,60 +1,295 @@
+import math
+
 import numpy as np
-from scipy.spatial.transform import Rotation as R
+
+from .profiling import instrument
 
 
+@instrument
 def abprop(*args):
     """
     This function is a python implementation of the MATLAB function:
     https://github.com/mribri999/MRSignalsSeqs/blob/master/Matlab/abprop.m
+
+    The operators are applied in order to M, an A as M -> A @ M and a B as M -> M + B, so every
+    A also acts on the B accumulated before it (as in the MATLAB original). Single-spin
+    counterpart of `abprop_batched`, which gives the same result for the same sequence stacked
+    as steps (A, B) with zero B where an A is not followed by one.
     """
     a_or_b = "a"
     A = np.eye(3)
     B = np.zeros((3, 1))
-    A_prev = np.eye(3)
     for a in args:
         if a.shape == (3, 3):
             A = a @ A
-            A_prev = a
+            B = a @ B
             a_or_b = "a"
         elif a.shape == (3, 1) or a.shape == (3,):
-            a = a.reshape(3, 1)
             if a_or_b == "a":
-                B = A_prev @ B + a
+                B = B + a.reshape(3, 1)
                 a_or_b = "b"
             else:
                 raise ValueError("Invalid input, B is followed by another B")
-    Mss = np.linalg.inv(np.eye(3) - A) @ B
+    Mss = np.linalg.solve(np.eye(3) - A, B)
+    return A, B, Mss
+
+
+@instrument
+def propagate_batched(A, B):
+    """
+    Composes stacked affine operators M -> A @ M + B along the step axis.
+    The steps are combined pairwise (log2(n_steps) numpy calls) instead of one
+    matrix product per step.
+    Parameters:
+        A (np.ndarray): Operators of shape (..., n_steps, 3, 3).
+        B (np.ndarray): Offsets of shape (..., n_steps, 3).
+
+    Returns:
+        tuple: Total A of shape (..., 3, 3) and total B of shape (..., 3), the identity and
+            zero for an empty sequence.
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    A, B = np.broadcast_arrays(A, B[..., None])
+    B = B[..., 0]
+    if A.shape[-3] == 0:
+        return np.broadcast_to(np.eye(3), A.shape[:-3] + (3, 3)).copy(), np.zeros(B.shape[:-2] + (3,))
+    while A.shape[-3] > 1:
+        if A.shape[-3] % 2:
+            A = np.concatenate([A, np.broadcast_to(np.eye(3), A[..., :1, :, :].shape)], axis=-3)
+            B = np.concatenate([B, np.zeros_like(B[..., :1, :])], axis=-2)
+        A_first, A_second = A[..., 0::2, :, :], A[..., 1::2, :, :]
+        B_first, B_second = B[..., 0::2, :], B[..., 1::2, :]
+        A = A_second @ A_first
+        B = (A_second @ B_first[..., None])[..., 0] + B_second
+    return A[..., 0, :, :], B[..., 0, :]
+
+
+@instrument
+def steady_state(A, B):
+    """
+    Solves Mss = A @ Mss + B for stacked operators with a batched solve.
+    Parameters:
+        A (np.ndarray): Operators of shape (..., 3, 3).
+        B (np.ndarray): Offsets of shape (..., 3).
+
+    Returns:
+        np.ndarray: Steady-state magnetization of shape (..., 3).
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    return np.linalg.solve(np.eye(3) - A, B[..., None])[..., 0]
+
+
+@instrument
+def abprop_batched(A, B):
+    """
+    Batched version of `abprop` for many isochromats at once.
+    Parameters:
+        A (np.ndarray): Operators of shape (n_spins, n_steps, 3, 3).
+        B (np.ndarray): Offsets of shape (n_spins, n_steps, 3), use zeros for
+            steps without a B term.
+
+    Returns:
+        tuple: A (n_spins, 3, 3), B (n_spins, 3) and Mss (n_spins, 3).
+    """
+    if np.shape(A)[-3] == 0:
+        raise ValueError("abprop_batched needs at least one step, the identity has no unique steady state")
+    A, B = propagate_batched(A, B)
+    Mss = steady_state(A, B)
     return A, B, Mss
 
 
-def rot_x(angle):
-    return R.from_euler("x", angle, degrees=True).as_matrix()
+def _as_radians(angle, degrees):
+    angle = np.asarray(angle, dtype=float)
+    return np.deg2rad(angle) if degrees else angle
+
+
+def _scalar_cos_sin(angle, degrees):
+    theta = float(angle)
+    if degrees:
+        theta = math.radians(theta)
+    return math.cos(theta), math.sin(theta)
 
 
-def rot_y(angle):
-    return R.from_euler("y", angle, degrees=True).as_matrix()
+@instrument
+def rot_x(angle, degrees=True):
+    """
+    Rotation matrix about x. An array of angles gives a stack of shape (..., 3, 3).
+    """
+    if np.ndim(angle) == 0:
+        c, s = _scalar_cos_sin(angle, degrees)
+        return np.array([[1.0, 0.0, 0.0], [0.0, c, -s], [0.0, s, c]])
+    return rot_axis([1, 0, 0], angle, degrees=degrees)
+
 
+@instrument
+def rot_y(angle, degrees=True):
+    """
+    Rotation matrix about y. An array of angles gives a stack of shape (..., 3, 3).
+    """
+    if np.ndim(angle) == 0:
+        c, s = _scalar_cos_sin(angle, degrees)
+        return np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+    return rot_axis([0, 1, 0], angle, degrees=degrees)
+
+
+@instrument
+def rot_z(angle, degrees=True):
+    """
+    Rotation matrix about z. An array of angles gives a stack of shape (..., 3, 3).
+    """
+    if np.ndim(angle) == 0:
+        c, s = _scalar_cos_sin(angle, degrees)
+        return np.array([[c, -s, 0.0], [s, c, 0.0], [0.0, 0.0, 1.0]])
+    return rot_axis([0, 0, 1], angle, degrees=degrees)
 
-def rot_z(angle):
-    return R.from_euler("z", angle, degrees=True).as_matrix()
+
+@instrument
+def rot_axis(axis, angle, degrees=True):
+    """
+    Closed-form (Rodrigues) rotation about an arbitrary axis, same convention as
+    scipy's `Rotation.from_rotvec`.
+    Parameters:
+        axis (np.ndarray): Rotation axis of shape (..., 3), does not need to be normalized.
+        angle (float or np.ndarray): Rotation angle, broadcast against the axis.
+        degrees (bool): Whether the angle is given in degrees.
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (..., 3, 3).
+    """
+    axis = np.asarray(axis, dtype=float)
+    theta = _as_radians(angle, degrees)
+    norm = np.linalg.norm(axis, axis=-1)
+    # a zero axis describes the identity: any unit vector with a zero angle
+    axis = np.where(norm[..., None] > 0, axis / np.where(norm > 0, norm, 1)[..., None], [0.0, 0.0, 1.0])
+    theta = np.where(norm > 0, theta, 0.0)
+    theta, kx, ky, kz = np.broadcast_arrays(theta, axis[..., 0], axis[..., 1], axis[..., 2])
+
+    c = np.cos(theta)
+    s = np.sin(theta)
+    v = 1 - c
+    R = np.empty(theta.shape + (3, 3))
+    R[..., 0, 0] = c + kx * kx * v
+    R[..., 0, 1] = kx * ky * v - kz * s
+    R[..., 0, 2] = kx * kz * v + ky * s
+    R[..., 1, 0] = ky * kx * v + kz * s
+    R[..., 1, 1] = c + ky * ky * v
+    R[..., 1, 2] = ky * kz * v - kx * s
+    R[..., 2, 0] = kz * kx * v - ky * s
+    R[..., 2, 1] = kz * ky * v + kx * s
+    R[..., 2, 2] = c + kz * kz * v
+    return R
+
+
+@instrument
+def rot_rf(flip, phase=0, off_resonance=0, degrees=True):
+    """
+    Rotation of one RF sample with phase and off-resonance precession.
+    The effective rotation vector is (flip * cos(phase), flip * sin(phase), off_resonance),
+    so a whole RF waveform is converted with a single call. phase=0 rotates about x,
+    phase=90 about y, and off_resonance alone is equivalent to `rot_z`.
+    Parameters:
+        flip (float or np.ndarray): Flip angle of each sample.
+        phase (float or np.ndarray): RF phase of each sample.
+        off_resonance (float or np.ndarray): Precession angle about z accumulated over the sample.
+        degrees (bool): Whether the angles are given in degrees.
+
+    Returns:
+        np.ndarray: Rotation matrices of shape (..., 3, 3).
+    """
+    flip = _as_radians(flip, degrees)
+    phase = _as_radians(phase, degrees)
+    off_resonance = _as_radians(off_resonance, degrees)
+    flip, phase, off_resonance = np.broadcast_arrays(flip, phase, off_resonance)
+    w = np.stack([flip * np.cos(phase), flip * np.sin(phase), off_resonance], axis=-1)
+    return rot_axis(w, np.linalg.norm(w, axis=-1), degrees=False)
+
+
+@instrument
+def mr2mc(Mr, out=None):
+    """
+    Real magnetization [Mx, My, Mz] to the complex basis [Mxy, conj(Mxy), Mz].
+    Parameters:
+        Mr (np.ndarray): Real magnetization of shape (..., 3).
+        out (np.ndarray): Complex buffer of shape (..., 3) to write to, None allocates one.
+
+    Returns:
+        np.ndarray: Complex magnetization of shape (..., 3).
+    """
+    Mr = np.asarray(Mr)
+    if out is None:
+        out = np.empty(Mr.shape, dtype=complex)
+    out.real[..., 0] = Mr[..., 0]
+    out.imag[..., 0] = Mr[..., 1]
+    out.real[..., 1] = Mr[..., 0]
+    np.negative(Mr[..., 1], out=out.imag[..., 1])
+    out.real[..., 2] = Mr[..., 2]
+    out.imag[..., 2] = 0
+    return out
+
+
+@instrument
+def mc2mr(Mc, out=None):
+    """
+    Complex basis [Mxy, conj(Mxy), Mz] back to real magnetization [Mx, My, Mz].
+    Parameters:
+        Mc (np.ndarray): Complex magnetization of shape (..., 3).
+        out (np.ndarray): Real buffer of shape (..., 3) to write to, None allocates one.
+
+    Returns:
+        np.ndarray: Real magnetization of shape (..., 3).
+    """
+    Mc = np.asarray(Mc)
+    if out is None:
+        out = np.empty(Mc.shape, dtype=float)
+    out[..., 0] = Mc.real[..., 0]
+    out[..., 1] = Mc.imag[..., 0]
+    out[..., 2] = Mc.real[..., 2]  # actually the imaginary part should be zero
+    return out
+
+
+def magnetization_views(Mr):
+    """
+    Zero-copy split view of real magnetization: Mxy = Mx + i My as a complex view of the x/y
+    pair of every vector, and Mz. Writing to the views writes to Mr. Inputs that cannot be
+    viewed this way (e.g. a transposed (3, n).T array) raise, convert them with
+    np.ascontiguousarray first.
+    Parameters:
+        Mr (np.ndarray): Float64 magnetization of shape (..., 3) with a contiguous last axis.
+
+    Returns:
+        tuple: Mxy (complex, shape (...,)) and Mz (real, shape (...,)).
+    """
+    if Mr.dtype != np.float64 or Mr.strides[-1] != Mr.itemsize:
+        raise ValueError("Magnetization views need a float64 array with a contiguous last axis")
+    return Mr[..., :2].view(complex)[..., 0], Mr[..., 2]
 
 
-def mr2mc(Mr):
-    Mc = np.zeros((len(Mr), 3), dtype=complex)
-    Mc[:, 0] = Mr[:, 0] + 1j * Mr[:, 1]
-    Mc[:, 1] = Mr[:, 0] - 1j * Mr[:, 1]
-    Mc[:, 2] = Mr[:, 2]
-    return Mc
+def mr2split(Mr, Mxy=None, Mz=None):
+    """Real magnetization (..., 3) to a complex Mxy and a real Mz array (...,), written to Mxy/Mz if given."""
+    Mr = np.asarray(Mr)
+    if Mxy is None:
+        Mxy = np.empty(Mr.shape[:-1], dtype=complex)
+    if Mz is None:
+        Mz = np.empty(Mr.shape[:-1], dtype=float)
+    Mxy.real = Mr[..., 0]
+    Mxy.imag = Mr[..., 1]
+    Mz[...] = Mr[..., 2]
+    return Mxy, Mz
 
 
-def mc2mr(Mc):
-    Mr = np.zeros((len(Mc), 3))
-    Mr[:, 0] = np.real(Mc[:, 0])
-    Mr[:, 1] = np.imag(Mc[:, 0])
-    Mr[:, 2] = np.real(Mc[:, 2])  # actually the imaginary part should be zero
-    return Mr
+def split2mr(Mxy, Mz, out=None):
+    """Complex Mxy and real Mz (...,) back to real magnetization (..., 3), written to out if given."""
+    if out is None:
+        out = np.empty(np.shape(Mxy) + (3,), dtype=float)
+    out[..., 0] = np.real(Mxy)
+    out[..., 1] = np.imag(Mxy)
+    out[..., 2] = Mz
+    return out
 
 
+@instrument
 def msinc(N, ncyc):
     """
     Computes the sinc function modulated by a Hamming window.
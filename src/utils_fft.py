@@ -1,19 +1,246 @@
+import os
+from functools import lru_cache
+
 import numpy as np
+import scipy.fft
+
+# Number of threads used by scipy.fft, -1 uses all cores
+FFT_WORKERS = -1
+
+# All transforms, masks and filters act on the last two axes, any leading axes
+# (slices, coils, frames, ...) are treated as a batch.
+
+
+# ----------------------------
+# FFT backend
+# ----------------------------
+@lru_cache(maxsize=32)
+def _fft_plan(shape):
+    """
+    Shape-dependent constants of the centered transforms, built once per image shape:
+    the modulation that folds fftshift into the input (a real checkerboard for even
+    sizes) and the index arrays that complete an rfft2 half spectrum by Hermitian symmetry.
+    """
+    rows, cols = shape
+    r = np.arange(rows)[:, None]
+    c = np.arange(cols)[None, :]
+    if rows % 2 == 0 and cols % 2 == 0:
+        modulation = np.where((r + c) % 2, -1.0, 1.0)
+    else:
+        modulation = np.exp(2j * np.pi * (r * (rows // 2) / rows + c * (cols // 2) / cols))
+    half = cols // 2 + 1
+    mirror_rows = (-np.arange(rows)) % rows
+    mirror_cols = cols - np.arange(half, cols)
+    for array in (modulation, mirror_rows, mirror_cols):
+        array.flags.writeable = False
+    return modulation, mirror_rows, mirror_cols
+
+
+def _hermitian_full(H, shape, mirror_rows, mirror_cols):
+    """Full 2D spectrum of a real signal from its rfft2 half spectrum."""
+    half = H.shape[-1]
+    F = np.empty(shape, dtype=H.dtype)
+    F[..., :half] = H
+    np.conjugate(H[..., mirror_rows, :][..., mirror_cols], out=F[..., half:])
+    return F
+
+
+def fft2_centered(image, fold_shift=True, workers=None):
+    """
+    Centered 2D FFT of the last two axes, equal to np.fft.fftshift(np.fft.fft2(image), axes=(-2, -1)).
+    Real images use rfft2 and the other half is filled by Hermitian symmetry. With fold_shift
+    the shift is applied as a precomputed modulation of the input instead of an fftshift copy
+    (for real images only when both sizes are even, where it is a real checkerboard).
+    """
+    workers = FFT_WORKERS if workers is None else workers
+    image = np.asarray(image)
+    modulation, mirror_rows, mirror_cols = _fft_plan(image.shape[-2:])
+
+    if np.isrealobj(image):
+        if fold_shift and np.isrealobj(modulation):
+            H = scipy.fft.rfft2(image * modulation, workers=workers)
+            return _hermitian_full(H, image.shape, mirror_rows, mirror_cols)
+        H = scipy.fft.rfft2(image, workers=workers)
+        return np.fft.fftshift(_hermitian_full(H, image.shape, mirror_rows, mirror_cols), axes=(-2, -1))
+
+    if fold_shift:
+        return scipy.fft.fft2(image * modulation, workers=workers)
+    return np.fft.fftshift(scipy.fft.fft2(image, workers=workers), axes=(-2, -1))
+
+
+def ifft2_magnitude(F_shifted, workers=None):
+    """
+    Magnitude of the inverse of a centered spectrum, equal to np.abs(np.fft.ifft2(np.fft.ifftshift(F))).
+    Shifting the spectrum only multiplies the image by a linear phase, so the magnitude
+    needs no ifftshift at all.
+    """
+    workers = FFT_WORKERS if workers is None else workers
+    return np.abs(scipy.fft.ifft2(F_shifted, workers=workers))
+
+
+def ifft2_real(F_shifted, workers=None):
+    """
+    Inverse of a centered spectrum of a real image (Hermitian symmetric) with irfft2,
+    only the unshifted half spectrum is gathered.
+    """
+    workers = FFT_WORKERS if workers is None else workers
+    rows, cols = F_shifted.shape[-2:]
+    half = cols // 2 + 1
+    src_rows = (np.arange(rows) + rows // 2) % rows
+    src_cols = (np.arange(half) + cols // 2) % cols
+    H = F_shifted[..., src_rows, :][..., src_cols]
+    return scipy.fft.irfft2(H, s=(rows, cols), workers=workers)
 
 
 # ----------------------------
 # FFT / IFFT Helper Functions
 # ----------------------------
 def fft_image(image):
-    F = np.fft.fft2(image)
-    F_shifted = np.fft.fftshift(F)
-    return F_shifted
+    return fft2_centered(image)
 
 
 def ifft_image(F_shifted):
-    F_ishifted = np.fft.ifftshift(F_shifted)
-    img_reconstructed = np.fft.ifft2(F_ishifted)
-    return np.abs(img_reconstructed)
+    return ifft2_magnitude(F_shifted)
+
+
+# ----------------------------
+# K-space masks
+# ----------------------------
+@lru_cache(maxsize=8)
+def radial_distance_sq(shape):
+    """Squared distance of every k-space sample from the center, cached per shape (read-only)."""
+    rows, cols = shape
+    crow, ccol = rows // 2, cols // 2
+    Y, X = np.ogrid[:rows, :cols]
+    dist_sq = (Y - crow) ** 2 + (X - ccol) ** 2
+    dist_sq.flags.writeable = False
+    return dist_sq
+
+
+def _clamp_radius(radius):
+    """Radius of a centered mask, negative values are treated as 0."""
+    return max(float(radius), 0.0)
+
+
+def _disk_region(shape, radius):
+    """
+    Bounding box (row slice, col slice) of the centered disk dist_sq <= radius**2, for a
+    radius clamped by `_clamp_radius` (sample offsets are integers, so floor(radius) bounds it).
+    """
+    rows, cols = shape
+    crow, ccol = rows // 2, cols // 2
+    r = int(np.floor(radius))
+    return (slice(max(crow - r, 0), min(crow + r + 1, rows)), slice(max(ccol - r, 0), min(ccol + r + 1, cols)))
+
+
+def _band_region(shape, cx, cy, band_radius):
+    """Rectangle of `select_single_frequency` around (cx, cy), as a (row slice, col slice)."""
+    rows, cols = shape
+    if band_radius <= 1:
+        row_min, row_max = max(cy, 0), min(cy + band_radius, rows)
+        col_min, col_max = max(cx, 0), min(cx + band_radius, cols)
+    else:
+        row_min, row_max = max(cy - band_radius // 2, 0), min(cy + band_radius // 2, rows)
+        col_min, col_max = max(cx - band_radius // 2, 0), min(cx + band_radius // 2, cols)
+    return (slice(row_min, row_max), slice(col_min, col_max))
+
+
+# full-resolution masks are large (a 1609 x 2450 float mask is about 31 MB), so only the
+# masks of the last few parameter sets are kept
+@lru_cache(maxsize=8)
+def _mask_entry(shape, kind, params):
+    """
+    Builds a mask once per (shape, kind, parameters). Radii, cutoffs and sigmas are clamped
+    to >= 0, and a zero width gives the DC-only mask.
+
+    Returns:
+        tuple: The read-only mask, the regions (slice tuples) outside of which the mask is
+            constant, and that constant value (0 or 1).
+    """
+    rows, cols = shape
+    dist_sq = radial_distance_sq(shape)
+    everywhere = [(slice(None), slice(None))]
+
+    if kind == "low-pass":
+        radius = _clamp_radius(params[0])
+        mask, regions, outside = dist_sq <= radius**2, [_disk_region(shape, radius)], 0
+    elif kind == "high-pass":
+        radius = _clamp_radius(params[0])
+        mask, regions, outside = dist_sq > radius**2, [_disk_region(shape, radius)], 1
+    elif kind == "single-freq":
+        freq_x, freq_y, band_radius = params
+        crow, ccol = rows // 2, cols // 2
+        regions = [
+            _band_region(shape, int(ccol + freq_x), int(crow + freq_y), band_radius),
+            _band_region(shape, int(ccol - freq_x), int(crow - freq_y), band_radius),
+        ]
+        mask = np.zeros(shape, dtype=bool)
+        for region in regions:
+            mask[region] = True
+        outside = 0
+    elif kind in ("hann", "gaussian", "butterworth"):
+        radius = _clamp_radius(params[0])
+        if radius == 0:
+            mask, regions = (dist_sq == 0).astype(float), [_disk_region(shape, 0)]
+        elif kind == "hann":
+            mask = np.where(dist_sq <= radius**2, 0.5 * (1 + np.cos(np.pi * np.sqrt(dist_sq) / radius)), 0.0)
+            regions = [_disk_region(shape, radius)]
+        elif kind == "gaussian":
+            mask, regions = np.exp(-dist_sq / (2 * radius**2)), everywhere
+        else:
+            mask, regions = 1 / (1 + (dist_sq / radius**2) ** params[1]), everywhere
+        outside = 0
+    else:
+        raise ValueError(f"Unknown mask type: {kind}")
+
+    mask.flags.writeable = False
+    return mask, regions, outside
+
+
+def kspace_mask(shape, kind, *params):
+    """
+    Cached k-space mask, centered like `fft_image`.
+    Parameters:
+        shape (tuple): Shape of the spectrum.
+        kind (str): "low-pass" / "high-pass" (cutoff), "single-freq" (freq_x, freq_y, band_radius),
+            or the smooth apodizations "hann" (radius), "gaussian" (sigma) and "butterworth" (cutoff, order).
+        params: Parameters of the mask type. Negative radii, cutoffs and sigmas count as 0, and
+            a smooth mask of width 0 keeps only the DC sample.
+
+    Returns:
+        np.ndarray: Read-only mask (boolean for the sharp masks, float for the smooth ones).
+    """
+    return _mask_entry(tuple(shape), kind, params)[0]
+
+
+def apply_mask(F_shifted, kind, *params, out=None):
+    """
+    Multiplies a centered spectrum (or a stack of them) by a cached mask, touching only the
+    regions where the mask is not constant. Pass out=F_shifted to filter in place.
+    """
+    mask, regions, outside = _mask_entry(F_shifted.shape[-2:], kind, params)
+    regions = [(Ellipsis, *region) for region in regions]
+    if out is F_shifted:
+        if outside == 1:
+            for region in regions:
+                out[region] *= mask[region]
+            return out
+        kept = [(region, F_shifted[region] * mask[region]) for region in regions]
+        out[...] = 0
+        for region, values in kept:
+            out[region] = values
+        return out
+
+    if out is None:
+        out = np.zeros_like(F_shifted) if outside == 0 else F_shifted.copy()
+    else:
+        out[...] = 0 if outside == 0 else F_shifted
+    for region in regions:
+        if outside == 0:
+            out[region] = F_shifted[region] * mask[region]
+        else:
+            out[region] *= mask[region]
+    return out
 
 
 # ----------------------------
@@ -24,15 +251,7 @@ def low_pass_filter(F_shifted, cutoff):
     Circular low-pass filter with radius = cutoff.
     Zeros out everything beyond cutoff distance from center.
     """
-    rows, cols = F_shifted.shape
-    crow, ccol = rows // 2, cols // 2
-
-    # Create a boolean mask
-    Y, X = np.ogrid[:rows, :cols]
-    dist_sq = (Y - crow) ** 2 + (X - ccol) ** 2
-    mask = dist_sq <= cutoff**2
-
-    return F_shifted * mask
+    return apply_mask(F_shifted, "low-pass", cutoff)
 
 
 def high_pass_filter(F_shifted, cutoff):
@@ -40,15 +259,7 @@ def high_pass_filter(F_shifted, cutoff):
     Circular high-pass filter with radius = cutoff.
     Zeros out everything within cutoff distance from center.
     """
-    rows, cols = F_shifted.shape
-    crow, ccol = rows // 2, cols // 2
-
-    # Create a boolean mask
-    Y, X = np.ogrid[:rows, :cols]
-    dist_sq = (Y - crow) ** 2 + (X - ccol) ** 2
-    mask = dist_sq > cutoff**2
-
-    return F_shifted * mask
+    return apply_mask(F_shifted, "high-pass", cutoff)
 
 
 def select_single_frequency(F_shifted, freq_x, freq_y, band_radius):
@@ -57,46 +268,145 @@ def select_single_frequency(F_shifted, freq_x, freq_y, band_radius):
     around (freq_x, freq_y) and its mirrored location.
     Everything else is zeroed out.
     """
-    rows, cols = F_shifted.shape
-    crow, ccol = rows // 2, cols // 2
+    return apply_mask(F_shifted, "single-freq", freq_x, freq_y, band_radius)
 
-    # Create a boolean mask (all False initially)
-    mask = np.zeros_like(F_shifted, dtype=bool)
 
-    # Primary frequency
-    cx = int(ccol + freq_x)
-    cy = int(crow + freq_y)
+# ----------------------------
+# Batches and coils
+# ----------------------------
+def root_sum_of_squares(images, axis=-3):
+    """Root-sum-of-squares coil combination of (complex or magnitude) images along the coil axis."""
+    images = np.asarray(images)
+    if np.iscomplexobj(images):
+        return np.sqrt(np.sum(images.real**2 + images.imag**2, axis=axis))
+    return np.sqrt(np.sum(images**2, axis=axis))
 
-    # Bounds for primary
-    if band_radius <= 1:
-        row_min = max(cy, 0)
-        row_max = min(cy + band_radius, rows)
-        col_min = max(cx, 0)
-        col_max = min(cx + band_radius, cols)
-    else:
-        row_min = max(cy - band_radius // 2, 0)
-        row_max = min(cy + band_radius // 2, rows)
-        col_min = max(cx - band_radius // 2, 0)
-        col_max = min(cx + band_radius // 2, cols)
 
-    mask[row_min:row_max, col_min:col_max] = True
+def stream_reconstruct(source, out=None, mask=None, coil_axis=None, from_image=False, chunk_size=8):
+    """
+    Filters and reconstructs a volume of centered spectra chunk by chunk along its first axis,
+    so that volumes larger than memory can be processed.
+    Parameters:
+        source (str or np.ndarray): Path of an `.npy` file (opened memory-mapped) or an array,
+            of shape (n_slices, ..., rows, cols), e.g. (slices, coils, frames, rows, cols).
+        out (str or np.ndarray): Path of an `.npy` file (written through `open_memmap`) or a
+            preallocated array, None for an in-memory array.
+        mask (tuple): (kind, *params) of a `kspace_mask` applied before reconstruction, or None.
+        coil_axis (int): Axis of `source` combined by root-sum-of-squares, None keeps all axes.
+            It cannot be the first (streamed) axis.
+        from_image (bool): The source holds images, which are transformed with `fft_image` first.
+        chunk_size (int): Number of slices per chunk.
 
-    # Mirrored frequency
-    mx = int(ccol - freq_x)
-    my = int(crow - freq_y)
+    Returns:
+        np.ndarray: Magnitude images of shape source.shape without the coil axis.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        source = np.load(source, mmap_mode="r")
+    shape = source.shape
+    if coil_axis is not None:
+        coil_axis %= len(shape)
+        if coil_axis == 0 or coil_axis >= len(shape) - 2:
+            raise ValueError("coil_axis must be a batch axis other than the first one")
+        shape = shape[:coil_axis] + shape[coil_axis + 1 :]
 
-    # Bounds for mirror
-    if band_radius <= 1:
-        row_min_m = max(my, 0)
-        row_max_m = min(my + band_radius, rows)
-        col_min_m = max(mx, 0)
-        col_max_m = min(mx + band_radius, cols)
-    else:
-        row_min_m = max(my - band_radius // 2, 0)
-        row_max_m = min(my + band_radius // 2, rows)
-        col_min_m = max(mx - band_radius // 2, 0)
-        col_max_m = min(mx + band_radius // 2, cols)
+    if out is None:
+        out = np.empty(shape)
+    elif isinstance(out, (str, os.PathLike)):
+        out = np.lib.format.open_memmap(out, mode="w+", dtype=np.float64, shape=shape)
+
+    for start in range(0, len(source), chunk_size):
+        F = np.asarray(source[start : start + chunk_size])
+        if from_image:
+            F = fft_image(F)
+        elif mask is not None:
+            F = F.copy()
+        if mask is not None:
+            apply_mask(F, *mask, out=F)
+        images = ifft_image(F)
+        if coil_axis is not None:
+            images = root_sum_of_squares(images, axis=coil_axis)
+        out[start : start + len(images)] = images
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+# ----------------------------
+# Incremental reconstruction
+# ----------------------------
+class IncrementalReconstructor:
+    """
+    Reconstructs masked versions of one centered spectrum, reusing the previous result.
+    The complex image of the current mask is kept, and when the mask changes only the k-space
+    samples whose mask value changed are transformed and added (the FFT is linear). The
+    changed samples are brought to the image with a separable inverse DFT restricted to their
+    rows and columns, which costs O(rows * cols * min(n_rows, n_cols)). A full inverse FFT is
+    used instead when the change touches more than `max_rank` rows and columns, and after every
+    `refresh_every` incremental updates to stop round-off from accumulating.
+    """
+
+    def __init__(self, F_shifted, max_rank=None, refresh_every=256):
+        self.F_shifted = F_shifted
+        rows, cols = F_shifted.shape
+        self.max_rank = int(2 * np.log2(rows * cols)) if max_rank is None else max_rank
+        self.refresh_every = refresh_every
+        self.mask = np.zeros(F_shifted.shape)
+        self.image = np.zeros(F_shifted.shape, dtype=complex)
+        self._entry = None
+        self._updates = 0
+
+    def _inverse_dft(self, changed_rows, changed_cols, delta):
+        """Inverse DFT (no shift, like `ifft2_magnitude`) of a spectrum nonzero only on the given rows/cols."""
+        rows, cols = self.F_shifted.shape
+        Ey = np.exp(2j * np.pi * np.outer(np.arange(rows), changed_rows) / rows) / rows
+        Ex = np.exp(2j * np.pi * np.outer(changed_cols, np.arange(cols)) / cols) / cols
+        if len(changed_rows) <= len(changed_cols):
+            return (Ey @ delta) @ Ex
+        return Ey @ (delta @ Ex)
+
+    def reconstruct(self, kind, *params):
+        """
+        Magnitude image of the spectrum filtered with `kspace_mask(shape, kind, *params)`,
+        equal to ifft_image(apply_mask(F_shifted, kind, *params)).
+        """
+        mask, regions, outside = _mask_entry(self.F_shifted.shape, kind, params)
+
+        # both masks are constant outside their regions, so with the same constant
+        # only the bounding box of all regions can change
+        window = (slice(None), slice(None))
+        if self._entry is not None and self._entry[2] == outside:
+            window = _bounding_box(self.F_shifted.shape, regions + self._entry[1])
+        delta_mask = np.subtract(mask[window], self.mask[window], dtype=float)
+        changed = delta_mask != 0
+        changed_rows = np.flatnonzero(np.any(changed, axis=1))
+        changed_cols = np.flatnonzero(np.any(changed, axis=0))
+
+        if min(len(changed_rows), len(changed_cols)) == 0:
+            pass
+        elif min(len(changed_rows), len(changed_cols)) <= self.max_rank and self._updates < self.refresh_every:
+            changed_window = np.ix_(changed_rows, changed_cols)
+            delta = self.F_shifted[window][changed_window] * delta_mask[changed_window]
+            changed_rows += window[0].indices(self.F_shifted.shape[0])[0]
+            changed_cols += window[1].indices(self.F_shifted.shape[1])[0]
+            self.image += self._inverse_dft(changed_rows, changed_cols, delta)
+            self._updates += 1
+        else:
+            self.image = scipy.fft.ifft2(self.F_shifted * mask, workers=FFT_WORKERS)
+            self._updates = 0
+
+        self.mask = mask
+        self._entry = (mask, regions, outside)
+        return np.abs(self.image)
 
-    mask[row_min_m:row_max_m, col_min_m:col_max_m] = True
 
-    return F_shifted * mask
+def _bounding_box(shape, regions):
+    """Smallest (row slice, col slice) containing all regions."""
+    row_bounds = [region[0].indices(shape[0])[:2] for region in regions]
+    col_bounds = [region[1].indices(shape[1])[:2] for region in regions]
+    row_bounds = [(start, stop) for start, stop in row_bounds if stop > start] or [(0, 0)]
+    col_bounds = [(start, stop) for start, stop in col_bounds if stop > start] or [(0, 0)]
+    return (
+        slice(min(b[0] for b in row_bounds), max(b[1] for b in row_bounds)),
+        slice(min(b[0] for b in col_bounds), max(b[1] for b in col_bounds)),
+    )
@@ -32,7 +32,14 @@ def plotM(M, z):
     fig.tight_layout()
 
 
-def plotM_animated(axs, M, z):
+def plotM_animated(axs, M, z, frame=None):
+    """
+    Draws one frame into the XY and XZ axes. M is either a single (n_positions, 3) frame or,
+    with `frame`, anything indexable by frame (a list, an array or a `TrajectoryRecorder`),
+    in which case only that frame is read.
+    """
+    if frame is not None:
+        M = np.asarray(M[frame])
     colors = colormaps["plasma"](np.linspace(0, 1, len(M)))
     axs[0].clear()
     axs[1].clear()
@@ -0,0 +1,16 @@
+import numpy as np
+
+from src import acquisition, utils_fft
+
+
+def test_cartesian_acquisition_matches_fft():
+    M = np.random.default_rng(0).random((16, 20))
+    kx, ky, _ = acquisition.cartesian_trajectory(M.shape)
+    signal = acquisition.simulate_acquisition(M, kx, ky, chunk_size=50, row_chunk=5)
+    np.testing.assert_allclose(signal.reshape(M.shape), utils_fft.fft_image(M), atol=1e-10)
+
+
+def test_empty_trajectory():
+    signal = acquisition.simulate_acquisition(np.ones((8, 8)), [], [], t=[], T2=0.05)
+    assert signal.shape == (0,)
+    assert signal.dtype == complex
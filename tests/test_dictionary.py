@@ -0,0 +1,21 @@
+from functools import partial
+
+import numpy as np
+
+from src import dictionary
+
+FISP = partial(dictionary.fisp_signal, flips=np.linspace(10, 60, 20), TR=0.01)
+
+
+def test_chunked_dictionary_matches_one_call():
+    params = dictionary.parameter_grid([0.5, 1.0, 2.0], [0.05, 0.1, 0.6], [0.9, 1.0])
+    D = dictionary.build_dictionary(params, FISP, chunk_size=4, workers=1, dtype=complex, progress=False)
+    np.testing.assert_allclose(D, FISP(*params.T), atol=1e-12)
+
+
+def test_empty_grid(capsys):
+    params = dictionary.parameter_grid([0.1], [0.5, 1.0])
+    assert params.shape == (0, 3)
+    D = dictionary.build_dictionary(params, FISP, workers=1)
+    assert D.shape == (0, 20)
+    assert "0/0 entries" in capsys.readouterr().err
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from src import epg, utils
+
+
+@pytest.fixture
+def isochromat():
+    M = np.array([0.3, -0.4, 0.8])
+    return M, epg.epg_state(1, M=M)
+
+
+@pytest.mark.parametrize("flip", [0, 30, 90, 143.7, 180])
+@pytest.mark.parametrize("phase, rotation", [(0, utils.rot_x), (90, utils.rot_y)])
+def test_epg_rf_matches_rotation(isochromat, flip, phase, rotation):
+    M, FZ = isochromat
+    np.testing.assert_allclose(epg.epg_to_m(epg.epg_rf(FZ, flip, phase)), rotation(flip) @ M, atol=1e-12)
+
+
+def test_epg_rf_matches_rot_rf(isochromat):
+    M, FZ = isochromat
+    np.testing.assert_allclose(epg.epg_to_m(epg.epg_rf(FZ, 50, 30)), utils.rot_rf(50, 30) @ M, atol=1e-12)
+
+
+@pytest.mark.parametrize("T1, T2, t", [(1.0, 0.1, 0.05), (0.8, 0.05, 0.2), (2.0, 2.0, 1.0)])
+def test_epg_relax_matches_relaxation_operator(isochromat, T1, T2, t):
+    M, FZ = isochromat
+    E1, E2 = np.exp(-t / T1), np.exp(-t / T2)
+    A, B, _ = utils.abprop(np.diag([E2, E2, E1]), np.array([0, 0, 1 - E1]))
+    np.testing.assert_allclose(epg.epg_to_m(epg.epg_relax(FZ, T1, T2, t)), A @ M + B[:, 0], atol=1e-12)
+
+
+def test_epg_batched_tissues_match_isochromats():
+    T1 = np.array([0.5, 1.0, 1.5])
+    T2 = np.array([0.05, 0.1, 0.2])
+    FZ = epg.epg_relax(epg.epg_rf(epg.epg_state(1, shape=(3,)), 40, 90), T1, T2, 0.01)
+    for k in range(3):
+        E1, E2 = np.exp(-0.01 / T1[k]), np.exp(-0.01 / T2[k])
+        A, B, _ = utils.abprop(utils.rot_y(40), np.diag([E2, E2, E1]), np.array([0, 0, 1 - E1]))
+        np.testing.assert_allclose(epg.epg_to_m(FZ[k]), A @ [0, 0, 1] + B[:, 0], atol=1e-12)
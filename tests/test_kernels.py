@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from src import utils
+from src.simulation import simulate_rf_gradient
+
+pytest.importorskip("numba")
+
+
+@pytest.mark.parametrize("relax", [False, True])
+def test_numba_matches_numpy(relax):
+    N, TB = 200, 4
+    rf = 90 * utils.msinc(N, TB / 4) / np.sum(utils.msinc(N, TB / 4))
+    rf = np.concatenate([rf, np.zeros(N // 2)])
+    gradient = np.concatenate([np.full(N, np.pi * TB * 3 / N), np.full(N // 2, -np.pi * TB * 3 / N)])
+    z = np.linspace(-1, 1, 1001)
+    T1, T2 = (np.linspace(0.5, 2, len(z)), 0.1) if relax else (np.inf, np.inf)
+    kwargs = dict(T1=T1, T2=T2, dt=1e-3, record_every=7)
+    M_numpy, frames_numpy = simulate_rf_gradient(rf, gradient, z, backend="numpy", **kwargs)
+    M_numba, frames_numba = simulate_rf_gradient(rf, gradient, z, backend="numba", **kwargs)
+    np.testing.assert_allclose(M_numba, M_numpy, atol=1e-12)
+    assert frames_numba.shape == frames_numpy.shape
+    np.testing.assert_allclose(frames_numba, frames_numpy, atol=1e-12)
+
+
+def test_numba_two_dimensional_positions():
+    rf = np.full(50, 2.0)
+    positions = np.random.default_rng(0).uniform(-1, 1, (300, 2))
+    gradient = np.random.default_rng(1).normal(size=(50, 2))
+    M_numpy, _ = simulate_rf_gradient(rf, gradient, positions, backend="numpy")
+    M_numba, _ = simulate_rf_gradient(rf, gradient, positions, backend="numba")
+    np.testing.assert_allclose(M_numba, M_numpy, atol=1e-12)
+
+
+def test_numba_complex_rf():
+    rf = 30 * np.exp(1j * np.linspace(0, 3, 64))
+    z = np.linspace(-1, 1, 101)
+    M_numpy, _ = simulate_rf_gradient(rf, 2.0, z, backend="numpy")
+    M_numba, _ = simulate_rf_gradient(rf, 2.0, z, backend="numba")
+    np.testing.assert_allclose(M_numba, M_numpy, atol=1e-12)
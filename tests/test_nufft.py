@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from src import acquisition
+from src.nufft import NufftPlan, direct_adjoint
+
+SHAPE = (32, 32)
+
+TRAJECTORIES = {
+    "radial": acquisition.radial_trajectory(48, 32)[:2],
+    "spiral": acquisition.spiral_trajectory(8, 400, 16, 8)[:2],
+}
+
+# (oversampling, width, table_size, relative tolerance): the defaults reach ~7e-4 on random
+# data, a wider kernel with a finer table ~5e-5
+KERNELS = [(2.0, 4, 1024, 2e-3), (2.0, 6, 8192, 1e-4)]
+
+
+def relative_error(image, reference):
+    return np.linalg.norm(image - reference) / np.linalg.norm(reference)
+
+
+@pytest.mark.parametrize("trajectory", TRAJECTORIES)
+@pytest.mark.parametrize("oversampling, width, table_size, tolerance", KERNELS)
+def test_adjoint_matches_direct_dft(trajectory, oversampling, width, table_size, tolerance):
+    kx, ky = TRAJECTORIES[trajectory]
+    data = np.random.default_rng(0).normal(size=(len(kx), 2)) @ [1, 1j]
+    plan = NufftPlan(kx, ky, SHAPE, oversampling=oversampling, width=width, table_size=table_size)
+    reference = direct_adjoint(kx, ky, data, SHAPE, plan.density)
+    assert relative_error(plan.adjoint(data), reference) < tolerance
+
+
+@pytest.mark.parametrize("trajectory", TRAJECTORIES)
+def test_adjoint_batches_frames(trajectory):
+    kx, ky = TRAJECTORIES[trajectory]
+    data = np.random.default_rng(1).normal(size=(3, len(kx), 2)) @ [1, 1j]
+    plan = NufftPlan(kx, ky, SHAPE)
+    images = plan.adjoint(data)
+    assert images.shape == (3,) + SHAPE
+    for frame, image in zip(data, images):
+        np.testing.assert_allclose(image, plan.adjoint(frame), atol=1e-12)
+
+
+@pytest.mark.parametrize("oversampling, width, expected, tolerance", [(2.0, 4, 0.914, 1e-3), (2.0, 6, 1.0, 0.01)])
+def test_cartesian_density_weights(oversampling, width, expected, tolerance):
+    kx, ky, _ = acquisition.cartesian_trajectory(SHAPE)
+    plan = NufftPlan(kx, ky, SHAPE, oversampling=oversampling, width=width)
+    np.testing.assert_allclose(plan.density, expected, atol=tolerance)
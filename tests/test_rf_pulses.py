@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from src.rf_pulses import _SLR_RIPPLES, _slr_ripples, rf_pulse
+from src.simulation import simulate_rf_gradient, simulate_rf_spinor
+
+
+def final_mz(rf, off_resonance=0.0):
+    """Mz after the pulse from Mz = 1, off_resonance in cycles per pulse duration."""
+    M, _ = simulate_rf_gradient(rf, 2 * np.pi / len(rf), np.atleast_1d(off_resonance), backend="numpy")
+    return M[0, 2]
+
+
+@pytest.mark.parametrize("b1", [0.7, 1.0, 1.5])
+@pytest.mark.parametrize("off_resonance", [0, 3, -5])
+def test_default_hsec_inverts(b1, off_resonance):
+    assert final_mz(rf_pulse("hsec", 512, b1=b1), off_resonance) < -0.98
+
+
+def test_hsec_leaves_spins_outside_the_sweep():
+    # the inverted band is 2 mu beta / pi ~ 16.5 cycles per pulse duration wide
+    assert final_mz(rf_pulse("hsec", 512), 14) > 0.98
+
+
+def test_hsec_below_the_adiabatic_threshold_fails_to_invert():
+    assert final_mz(rf_pulse("hsec", 512, adiabaticity=0.5)) > -0.5
+
+
+def test_complex_rf_matches_spinor_simulation():
+    rf = rf_pulse("hsec", 256)
+    f = np.linspace(-12, 12, 49)
+    M, _ = simulate_rf_gradient(rf, 2 * np.pi / len(rf), f, backend="numpy")
+    M_spinor, _ = simulate_rf_spinor(rf, 2 * np.pi / len(rf), f)
+    np.testing.assert_allclose(M, M_spinor, atol=1e-10)
+    # a constant phase only turns the rotation axes, the inversion profile stays the same
+    M_shifted, _ = simulate_rf_gradient(rf * np.exp(1j), 2 * np.pi / len(rf), f, backend="numpy")
+    np.testing.assert_allclose(M_shifted[:, 2], M[:, 2], atol=1e-10)
+
+
+def slr_bands(TB, kind, d1=0.01, d2=0.01):
+    """Pass- and stopband of an SLR design, widened by the at most 16% the design may add."""
+    width = 1.16 * _slr_ripples(*_SLR_RIPPLES[kind](d1, d2)) / TB
+    return (1 - width) * TB / 2, (1 + width) * TB / 2
+
+
+def test_slr_inversion_meets_its_ripples():
+    N, TB = 128, 4
+    rf = rf_pulse("slr", N, TB=TB, flip=180)
+    passband, stopband = slr_bands(TB, "inv")
+    f = np.linspace(-2 * TB, 2 * TB, 641)
+    _, profiles = simulate_rf_spinor(rf, 2 * np.pi / N, f)
+    Mz = profiles["inversion"]
+    assert np.all(Mz[np.abs(f) < passband] < -1 + 0.01)
+    assert np.all(Mz[np.abs(f) > stopband] > 1 - 0.01)
+    assert final_mz(rf) < -0.99
+
+
+def test_slr_excitation_meets_its_ripples():
+    N, TB = 128, 4
+    rf = rf_pulse("slr", N, TB=TB, flip=90)
+    passband, stopband = slr_bands(TB, "ex")
+    f = np.linspace(-2 * TB, 2 * TB, 641)
+    _, profiles = simulate_rf_spinor(rf, 2 * np.pi / N, f)
+    Mxy = np.abs(profiles["excitation"])
+    np.testing.assert_allclose(Mxy[np.abs(f) < passband], 1, atol=0.01)
+    assert np.all(Mxy[np.abs(f) > stopband] < 0.01)
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from src import utils
+from src.sequence import RF, Delay, Gradient, Readout, Sequence
+from src.steady_state import inversion_recovery_operators, relaxation_operator
+
+T1, T2 = 0.9, 0.1
+TR, TI, TE = 2.0, 0.5, 0.02
+
+
+def manual_operators(events, off_resonance=0.0, position=0.0):
+    """One abprop argument per event, as the notebooks write sequences out by hand."""
+    args = []
+    for event in events:
+        if isinstance(event, RF):
+            args.append(utils.rot_rf(event.flip, event.phase))
+        elif isinstance(event, (Delay, Gradient)):
+            angle = off_resonance * event.duration + (position * event.area if isinstance(event, Gradient) else 0)
+            A, B = relaxation_operator(T1, T2, event.duration, angle)
+            args += [A, B]
+    return args
+
+
+def inversion_recovery():
+    return [Delay(TR - TI - TE), RF(-180), Delay(TI), RF(-90), Delay(TE), Readout()]
+
+
+def test_inversion_recovery_matches_abprop():
+    events = inversion_recovery()
+    A, B, Mss = utils.abprop(*manual_operators(events))
+    A_seq, B_seq = Sequence(events).propagate(T1, T2)
+    np.testing.assert_allclose(A_seq, A, atol=1e-12)
+    np.testing.assert_allclose(B_seq, B[:, 0], atol=1e-12)
+    np.testing.assert_allclose(Sequence(events).steady_state(T1, T2), Mss[:, 0], atol=1e-12)
+
+    A_ir, B_ir = inversion_recovery_operators(T1, T2, TI, TE, TR)
+    np.testing.assert_allclose(A_seq, A_ir, atol=1e-12)
+    np.testing.assert_allclose(B_seq, B_ir, atol=1e-12)
+
+
+@pytest.mark.parametrize("off_resonance, position", [(0.0, 0.0), (40.0, 0.0), (15.0, 0.3)])
+def test_merged_delays_gradients_and_rf_match_abprop(off_resonance, position):
+    # consecutive RF events, delays and gradients are merged into single steps when compiling
+    events = [
+        RF(30, 20),
+        RF(45, 90),
+        Delay(0.004),
+        Gradient(0.002, 360),
+        Delay(0.001),
+        Readout(),
+        RF(-60),
+        Gradient(0.003, -180),
+        Gradient(0.001, 90),
+    ]
+    sequence = Sequence(events)
+    assert sequence.compile().n_steps == 2
+    A, B, Mss = utils.abprop(*manual_operators(events, off_resonance, position))
+    A_seq, B_seq = sequence.propagate(T1, T2, off_resonance, position)
+    np.testing.assert_allclose(A_seq, A, atol=1e-12)
+    np.testing.assert_allclose(B_seq, B[:, 0], atol=1e-12)
+    np.testing.assert_allclose(sequence.steady_state(T1, T2, off_resonance, position), Mss[:, 0], atol=1e-12)
+
+
+def test_signals_match_abprop_up_to_each_readout():
+    events = [RF(90), Delay(0.01), Readout("first"), RF(180, 90), Gradient(0.02, 90), Readout("echo"), Delay(0.5)]
+    off_resonance, position = 25.0, 0.2
+    M0 = np.array([0.1, -0.2, 0.9])
+    signals = Sequence(events).signals(T1, T2, off_resonance, position, M=M0)
+    readouts = [k for k, event in enumerate(events) if isinstance(event, Readout)]
+    assert signals.shape == (len(readouts), 3)
+    for signal, k in zip(signals, readouts):
+        A, B, _ = utils.abprop(*manual_operators(events[:k], off_resonance, position))
+        np.testing.assert_allclose(signal, A @ M0 + B[:, 0], atol=1e-12)
+
+    # without M the signals start from the steady state of the repeated sequence
+    _, _, Mss = utils.abprop(*manual_operators(events, off_resonance, position))
+    signals = Sequence(events).signals(T1, T2, off_resonance, position)
+    A, B, _ = utils.abprop(*manual_operators(events[: readouts[0]], off_resonance, position))
+    np.testing.assert_allclose(signals[0], A @ Mss[:, 0] + B[:, 0], atol=1e-12)
+
+
+def test_batched_tissues_match_single_spins():
+    events = inversion_recovery()
+    T1s = np.array([0.3, 0.9, 1.5])
+    T2s = np.array([0.05, 0.1, 0.2])
+    signals = Sequence(events).signals(T1s[:, None], T2s[:, None], np.array([0.0, 30.0]))
+    assert signals.shape == (3, 2, 1, 3)
+    for i in range(3):
+        for j, off_resonance in enumerate([0.0, 30.0]):
+            expected = Sequence(events).signals(T1s[i], T2s[i], off_resonance)
+            np.testing.assert_allclose(signals[i, j], expected, atol=1e-12)
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+
+from src import utils
+from src.simulation import simulate_rf_gradient, simulate_rf_spinor
+
+
+def test_spinor_matches_rotation_path():
+    rf = 90 * utils.msinc(200, 2) / np.sum(utils.msinc(200, 2))
+    z = np.linspace(-1, 1, 101)
+    gradient = np.pi * 4 * 3 / 200
+    M_rotation, _ = simulate_rf_gradient(rf, gradient, z, backend="numpy")
+    M_spinor, profiles = simulate_rf_spinor(rf, gradient, z)
+    np.testing.assert_allclose(M_spinor, M_rotation, atol=1e-10)
+    np.testing.assert_allclose(profiles["inversion"], M_rotation[:, 2], atol=1e-10)
+    np.testing.assert_allclose(profiles["excitation"], M_rotation[:, 0] + 1j * M_rotation[:, 1], atol=1e-10)
+
+
+def test_transposed_magnetization():
+    # 3b_2_rf_gradient.ipynb builds the initial state as a transposed (Fortran-ordered) array
+    z = np.linspace(-1, 1, 51)
+    M = np.array([z * 0, z * 0, np.ones(len(z))]).T
+    rf = 90 * utils.msinc(100, 1) / np.sum(utils.msinc(100, 1))
+    M_final, _ = simulate_rf_gradient(rf, np.pi * 4 * 3 / 100, z, M=M, backend="numpy")
+    M_reference, _ = simulate_rf_gradient(rf, np.pi * 4 * 3 / 100, z, M=np.ascontiguousarray(M), backend="numpy")
+    np.testing.assert_array_equal(M_final, M_reference)
+    np.testing.assert_array_equal(M[:, 2], 1)
+
+
+def test_magnetization_views_of_transposed_array():
+    Mr = np.arange(12.0).reshape(3, 4).T
+    with pytest.raises(ValueError):
+        utils.magnetization_views(Mr)
+    Mr = np.ascontiguousarray(Mr)
+    Mxy, Mz = utils.magnetization_views(Mr)
+    np.testing.assert_array_equal(Mxy, Mr[:, 0] + 1j * Mr[:, 1])
+    np.testing.assert_array_equal(Mz, Mr[:, 2])
+    Mxy *= 1j
+    Mz[:] = 0
+    np.testing.assert_array_equal(Mr[:, :2], [[-4, 0], [-5, 1], [-6, 2], [-7, 3]])
+    np.testing.assert_array_equal(Mr[:, 2], 0)
+
+
+def notebook_slice_selection(rf, z, TB, n_refocus):
+    """The excitation and refocusing loops of 3b_2_rf_gradient.ipynb, one complex-domain rotation per step."""
+    N = len(rf)
+    phase = np.exp(np.pi * 1j * z * TB * 3 / N)
+    phmult = np.array([phase, np.conj(phase), np.ones(len(phase))]).T
+    T = np.array([[1, 1j, 0], [1, -1j, 0], [0, 0, 1]])
+    Mc = utils.mr2mc(np.array([z * 0, z * 0, np.ones(len(z))]).T)
+    frames = []
+    for k in range(N):
+        R = T @ Rotation.from_euler("y", rf[k], degrees=True).as_matrix() @ np.linalg.inv(T)
+        Mc = phmult * (R @ Mc.T).T
+        frames.append(utils.mc2mr(Mc))
+    for _ in range(n_refocus):
+        Mc = np.conj(phmult) * Mc
+        frames.append(utils.mc2mr(Mc))
+    return np.array(frames)
+
+
+def test_rf_gradient_matches_notebook_loop():
+    N, TB = 100, 4
+    z = np.arange(-1, 1, 0.05)
+    rf = utils.msinc(N, TB / 4)
+    rf = rf * 90 / np.sum(rf)
+    n_refocus = N // 2 + 4
+    gradient = np.pi * TB * 3 / N
+    expected = notebook_slice_selection(rf, z, TB, n_refocus)
+
+    rf_seq = np.concatenate([rf, np.zeros(n_refocus)])
+    gradient_seq = np.concatenate([np.full(N, gradient), np.full(n_refocus, -gradient)])
+    M, frames = simulate_rf_gradient(rf_seq, gradient_seq, z, record_every=1, backend="numpy")
+    np.testing.assert_allclose(frames, expected, atol=1e-12)
+    np.testing.assert_allclose(M, expected[-1], atol=1e-12)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from src import steady_state, utils
+
+
+def test_cache_matches_direct_solve():
+    cache = steady_state.SteadyStateCache(steady_state.ssfp_operators)
+    T1, T2 = np.meshgrid([0.5, 1.0, 1.5], [0.05, 0.1])
+    np.testing.assert_allclose(
+        cache(T1, T2, 30, 0.01), utils.steady_state(*steady_state.ssfp_operators(T1, T2, 30, 0.01)), atol=1e-12
+    )
+
+
+def test_cache_info_counts_rows_like_lru_cache():
+    cache = steady_state.SteadyStateCache(steady_state.ssfp_operators)
+    cache([1.0, 1.0, 2.0], 0.1, 30, 0.01)
+    assert cache.cache_info() == {"hits": 1, "misses": 2, "maxsize": 65536, "currsize": 2}
+    cache([1.0, 3.0], 0.1, 30, 0.01)
+    assert cache.cache_info() == {"hits": 2, "misses": 3, "maxsize": 65536, "currsize": 3}
+
+
+def test_cached_entries_do_not_view_the_batch():
+    cache = steady_state.SteadyStateCache(steady_state.ssfp_operators)
+    cache(np.linspace(0.5, 2, 100), 0.1, 30, 0.01)
+    assert all(m.base is None for m in cache._cache.values())
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+from scipy.spatial.transform import Rotation
+
+from src import utils
+
+
+def random_sequence(rng, n_operators):
+    """Random abprop arguments (runs of consecutive As included, no two Bs in a row) and the same sequence as steps."""
+    args, As, Bs = [], [], []
+    for k in range(n_operators):
+        if k > 0 and args[-1].shape == (3, 3) and rng.random() < 0.4:
+            b = rng.normal(size=(3, 1)) if rng.random() < 0.5 else rng.normal(size=3)
+            args.append(b)
+            Bs[-1] = b.reshape(3)
+        else:
+            a = 0.9 * utils.rot_axis(rng.normal(size=3), rng.uniform(0, 360))
+            args.append(a)
+            As.append(a)
+            Bs.append(np.zeros(3))
+    return args, np.array(As), np.array(Bs)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_abprop_matches_batched_propagation(seed):
+    rng = np.random.default_rng(seed)
+    args, As, Bs = random_sequence(rng, rng.integers(1, 10))
+    A, B, Mss = utils.abprop(*args)
+    A_batched, B_batched, Mss_batched = utils.abprop_batched(As[None], Bs[None])
+    np.testing.assert_allclose(A, A_batched[0], atol=1e-12)
+    np.testing.assert_allclose(B[:, 0], B_batched[0], atol=1e-12)
+    np.testing.assert_allclose(Mss[:, 0], Mss_batched[0], atol=1e-12)
+
+
+def test_abprop_applies_every_a_to_the_accumulated_b():
+    A1 = np.diag([0.5, 0.5, 0.9])
+    A2 = utils.rot_x(90)
+    b = np.array([[0.0], [0.0], [0.1]])
+    A, B, _ = utils.abprop(A1, b, A1, A2)
+    np.testing.assert_allclose(A, A2 @ A1 @ A1, atol=1e-12)
+    np.testing.assert_allclose(B, A2 @ A1 @ b, atol=1e-12)
+
+
+def test_abprop_rejects_consecutive_bs():
+    with pytest.raises(ValueError):
+        utils.abprop(np.eye(3) * 0.5, np.ones(3), np.ones(3))
+
+
+def test_empty_sequences():
+    A, B = utils.propagate_batched(np.zeros((2, 0, 3, 3)), np.zeros((2, 0, 3)))
+    np.testing.assert_array_equal(A, np.broadcast_to(np.eye(3), (2, 3, 3)))
+    np.testing.assert_array_equal(B, 0)
+    with pytest.raises(ValueError):
+        utils.abprop_batched(np.zeros((2, 0, 3, 3)), np.zeros((2, 0, 3)))
+
+
+@pytest.mark.parametrize("axis, rotation", [("x", utils.rot_x), ("y", utils.rot_y), ("z", utils.rot_z)])
+@pytest.mark.parametrize("angle", [0, 30, -123.4, 720, np.float64(77)])
+def test_fixed_axis_rotations_match_scipy(axis, rotation, angle):
+    expected = Rotation.from_euler(axis, angle, degrees=True).as_matrix()
+    np.testing.assert_allclose(rotation(angle), expected, atol=1e-12)
+    np.testing.assert_allclose(rotation(np.deg2rad(angle), degrees=False), expected, atol=1e-12)
+
+
+@pytest.mark.parametrize("axis, rotation", [("x", utils.rot_x), ("y", utils.rot_y), ("z", utils.rot_z)])
+def test_batched_fixed_axis_rotations_match_scipy(axis, rotation):
+    angles = np.linspace(-360, 360, 12).reshape(3, 4)
+    expected = Rotation.from_euler(axis, angles.reshape(-1, 1), degrees=True).as_matrix().reshape(3, 4, 3, 3)
+    np.testing.assert_allclose(rotation(angles), expected, atol=1e-12)
+
+
+def test_rot_axis_matches_scipy_rotvec():
+    rng = np.random.default_rng(0)
+    axes = rng.normal(size=(50, 3))
+    angles = rng.uniform(-360, 360, 50)
+    unit = axes / np.linalg.norm(axes, axis=-1, keepdims=True)
+    expected = Rotation.from_rotvec(unit * np.deg2rad(angles)[:, None]).as_matrix()
+    np.testing.assert_allclose(utils.rot_axis(axes, angles), expected, atol=1e-12)
+    np.testing.assert_allclose(utils.rot_axis([0, 0, 0], 30), np.eye(3), atol=1e-12)
+
+
+def test_rot_rf_matches_scipy_rotvec():
+    rng = np.random.default_rng(1)
+    flip, phase, off_resonance = rng.uniform(-180, 180, (3, 40))
+    rotvec = np.deg2rad(
+        np.stack([flip * np.cos(np.deg2rad(phase)), flip * np.sin(np.deg2rad(phase)), off_resonance], -1)
+    )
+    expected = Rotation.from_rotvec(rotvec).as_matrix()
+    np.testing.assert_allclose(utils.rot_rf(flip, phase, off_resonance), expected, atol=1e-12)
+    np.testing.assert_allclose(utils.rot_rf(40, 0), utils.rot_x(40), atol=1e-12)
+    np.testing.assert_allclose(utils.rot_rf(40, 90), utils.rot_y(40), atol=1e-12)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from src import utils_fft
+
+
+@pytest.fixture
+def spectrum():
+    return utils_fft.fft_image(np.random.default_rng(0).random((96, 120)))
+
+
+def test_incremental_reconstruction_matches_full_ifft(spectrum):
+    # a slider drag: growing and shrinking cutoffs, a switch of the constant outside the
+    # mask (low-pass to high-pass) and smooth masks
+    masks = [("low-pass", c) for c in (5, 6, 8.5, 12, 11, 3)]
+    masks += [("high-pass", 4), ("high-pass", 7), ("hann", 10), ("single-freq", 3, 2, 2), ("low-pass", 9)]
+    reconstructor = utils_fft.IncrementalReconstructor(spectrum)
+    for kind, *params in masks:
+        expected = utils_fft.ifft_image(utils_fft.apply_mask(spectrum, kind, *params))
+        np.testing.assert_allclose(reconstructor.reconstruct(kind, *params), expected, atol=1e-10)
+
+
+def test_incremental_reconstruction_refreshes(spectrum):
+    reconstructor = utils_fft.IncrementalReconstructor(spectrum, refresh_every=3)
+    for cutoff in range(2, 20):
+        expected = utils_fft.ifft_image(utils_fft.low_pass_filter(spectrum, cutoff))
+        np.testing.assert_allclose(reconstructor.reconstruct("low-pass", cutoff), expected, atol=1e-10)